@@ -1,5 +1,8 @@
 from django.apps import AppConfig
 
 
-class InterviewTestConfig(AppConfig):
-    name = 'interview_test'
+class ApiConfig(AppConfig):
+    name = 'api'
+
+    def ready(self):
+        from . import signals  # connects the model signal receivers
@@ -0,0 +1,188 @@
+# Authored by Peter Garas for Ocom Software
+
+import hashlib
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from config import replicas
+
+# each cached API response depends on the tables listed here; a change to any of them invalidates it
+DEPENDENCIES = {
+    'libraries': ('library',),
+    'projects': ('project', 'projectlibrary', 'library'),
+    'project_libraries': ('projectlibrary', 'library'),
+}
+
+# the API lists whose responses are cached server side
+CACHED_LISTS = ('libraries', 'projects')
+
+
+def _version_key(table):
+    return 'api:version:{}'.format(table)
+
+
+def _modified_key(table):
+    return 'api:modified:{}'.format(table)
+
+
+def _stats_key(namespace, outcome):
+    return 'api:stats:{}:{}'.format(namespace, outcome)
+
+
+def get_version(table):
+    """
+    Returns the change counter of a table. A missing counter (first use or cache eviction) is started from the
+    current time so that it never goes back to a value that older cache entries were stored under.
+    """
+    version = cache.get(_version_key(table))
+
+    if version is None:
+        now = time.time()
+        cache.add(_version_key(table), int(now * 1000), None)
+        cache.add(_modified_key(table), int(now), None)
+        version = cache.get(_version_key(table))
+
+    return version
+
+
+def get_last_modified(table):
+    """
+    Returns the (whole second) timestamp of the last change to a table. When it is not known any more, the current
+    time is assumed.
+    """
+    modified = cache.get(_modified_key(table))
+
+    if modified is None:
+        modified = int(time.time())
+        cache.add(_modified_key(table), modified, None)
+
+    return modified
+
+
+def _increment_version(table):
+    try:
+        cache.incr(_version_key(table))
+    except ValueError:
+        get_version(table)
+
+    cache.set(_modified_key(table), int(time.time()), None)
+
+
+def bump_version(*tables):
+    """
+    Marks tables as changed. The counters are bumped right away and once more when the current transaction commits,
+    so a response cached by another request while the transaction was still open is not served afterwards.
+    """
+    def increment_all():
+        for table in tables:
+            _increment_version(table)
+
+    increment_all()
+    transaction.on_commit(increment_all)
+
+
+def _record(namespace, outcome):
+    key = _stats_key(namespace, outcome)
+
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+
+def get_stats():
+    stats = {}
+
+    for namespace in CACHED_LISTS:
+        hits = cache.get(_stats_key(namespace, 'hit'), 0)
+        misses = cache.get(_stats_key(namespace, 'miss'), 0)
+        stats[namespace] = {'hits': hits, 'misses': misses}
+
+    return stats
+
+
+def _request_key(namespace, request):
+    # the table versions, the current date (the active/inactive lists change at midnight without any write) and a
+    # digest of the requested host, path and (sorted) query parameters
+    versions = '.'.join(str(get_version(table)) for table in DEPENDENCIES[namespace])
+    params = u'&'.join(sorted(u'{}={}'.format(key, value) for key, values in request.query_params.lists()
+                              for value in values))
+    url = u'{}{}?{}'.format(request.get_host(), request.path, params)
+    return '{}:{}:{}'.format(versions, date.today().isoformat(), hashlib.md5(url.encode('utf-8')).hexdigest())
+
+
+@contextmanager
+def _reading(namespace):
+    # a replica may not have caught up with a change made in the last REPLICA_PIN_SECONDS (see config/replicas.py),
+    # and data built from it would be cached or ETagged under the new table versions: such data is read from the
+    # primary, and everything else from a replica
+    recent = time.time() - getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+    if any(get_last_modified(table) >= int(recent) for table in DEPENDENCIES[namespace]):
+        with replicas.primary():
+            yield
+    else:
+        yield
+
+
+def cached_response_data(namespace, request, build):
+    """
+    Returns the response data for a GET request on an API list, calling build() only when nothing was cached for
+    the same host, path and query parameters on the same day since the tables the list depends on last changed.
+    build() reads from the primary while the tables may still be changing on the replicas (see _reading).
+    """
+    key = 'api:list:{}:{}'.format(namespace, _request_key(namespace, request))
+    data = cache.get(key)
+
+    if data is None:
+        _record(namespace, 'miss')
+
+        with _reading(namespace):
+            data = build()
+
+        cache.set(key, data, getattr(settings, 'API_LIST_CACHE_TIMEOUT', 300))
+    else:
+        _record(namespace, 'hit')
+
+    return data
+
+
+def conditional(namespace):
+    """
+    Decorator for read-only viewset actions adding an ETag and a Last-Modified header derived from the change
+    counters of the tables the response depends on (and the current date). A request whose If-None-Match (or
+    If-Modified-Since) header still matches is answered with "304 Not Modified" without calling the action at all.
+    Responses are marked for revalidation on every use, so clients always check back but only download data that has
+    changed. The action reads from a replica only once the replicas have the data the ETag stands for (see _reading).
+    """
+    def get_etag(request, *args, **kwargs):
+        return hashlib.md5('{}:{}'.format(namespace, _request_key(namespace, request))).hexdigest()
+
+    def get_modified(request, *args, **kwargs):
+        # never before the start of the day, for clients that only send If-Modified-Since (see _request_key)
+        start_of_day = int(time.mktime(date.today().timetuple()))
+        return datetime.utcfromtimestamp(max([get_last_modified(table) for table in DEPENDENCIES[namespace]] +
+                                             [start_of_day]))
+
+    def decorator(action):
+        @wraps(action)
+        def wrapper(viewset, request, *args, **kwargs):
+            @condition(etag_func=get_etag, last_modified_func=get_modified)
+            def view(request, *args, **kwargs):
+                with _reading(namespace):
+                    return action(viewset, request, *args, **kwargs)
+
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,129 @@
+# Authored by Peter Garas for Ocom Software
+
+# Change events
+#
+# Every committed change to a library, project or project library entry is published as an event to a broker, which
+# the event stream (see EventStreamView) relays to the browsers as Server-Sent Events. An event only names what
+# changed ({"model": "project", "action": "saved", "ids": [...]}); clients fetch the changed rows themselves through
+# the delta sync (see api/sync.py).
+#
+# The broker is set by API_EVENTS_BROKER. LocalBroker keeps the recent events in memory, so only the clients served
+# by the same process hear of a change: a broker shared by every worker (e.g. on Redis pub/sub) has to implement the
+# same publish() and listen() methods. Clients that missed events (a restart, or more than API_EVENTS_BUFFER_SIZE
+# events since they listened) get a "reset" event instead, and sync from their last token.
+
+import collections
+import json
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# how long clients wait before reconnecting to a stream that ended
+RETRY_MILLISECONDS = 3000
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class LocalBroker(object):
+    """
+    An in-process broker holding the last 'size' events in memory. Event ids are consecutive numbers starting after
+    the time of the broker start (in milliseconds), so ids from before a restart are recognized as unknown.
+    """
+
+    def __init__(self, size=None):
+        self.events = collections.deque(maxlen=size or getattr(settings, 'API_EVENTS_BUFFER_SIZE', 1000))
+        self.first_id = self.last_id = int(time.time() * 1000)
+        self.condition = threading.Condition()
+
+    def publish(self, data):
+        with self.condition:
+            self.last_id += 1
+            self.events.append((self.last_id, data))
+            self.condition.notify_all()
+
+    def get_last_id(self):
+        return self.last_id
+
+    def listen(self, last_id, timeout):
+        """
+        Returns the (id, data) pairs of the events after 'last_id', waiting up to 'timeout' seconds for one. Returns
+        None when the events after 'last_id' are not all known any more.
+        """
+        with self.condition:
+            if self.last_id == last_id:
+                self.condition.wait(timeout)
+
+            if not self.first_id <= last_id <= self.last_id:
+                return None
+
+            if last_id < self.last_id and (not self.events or self.events[0][0] > last_id + 1):
+                return None
+
+            return [(event_id, data) for event_id, data in self.events if event_id > last_id]
+
+
+def get_broker():
+    global _broker
+
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'API_EVENTS_BROKER', 'api.events.LocalBroker'))()
+
+    return _broker
+
+
+def reset_broker():
+    global _broker
+
+    with _broker_lock:
+        _broker = None
+
+
+def publish(model_name, action, ids):
+    """
+    Publishes a change to the rows of a model (see api/signals.py) once the current transaction commits, so that
+    clients never fetch changes before they are visible.
+    """
+    data = {'model': model_name, 'action': action, 'ids': list(ids)}
+
+    if data['ids']:
+        transaction.on_commit(lambda: get_broker().publish(data))
+
+
+def format_event(event_id, name, data):
+    return 'id: {}\nevent: {}\ndata: {}\n\n'.format(event_id, name, json.dumps(data))
+
+
+def stream(last_id=None, duration=None):
+    """
+    Yields the events after 'last_id' (or from now on) in the text/event-stream format, for 'duration' seconds, with
+    a comment every API_EVENTS_HEARTBEAT_SECONDS to keep the connection open. Clients reconnect afterwards, sending
+    the id of the last event they received.
+    """
+    broker = get_broker()
+    heartbeat = getattr(settings, 'API_EVENTS_HEARTBEAT_SECONDS', 15)
+    deadline = time.time() + (duration if duration is not None else getattr(settings, 'API_EVENTS_STREAM_SECONDS',
+                                                                            60))
+
+    yield 'retry: {}\n\n'.format(RETRY_MILLISECONDS)
+
+    if last_id is None:
+        last_id = broker.get_last_id()
+
+    while True:
+        events = broker.listen(last_id, max(0, min(heartbeat, deadline - time.time())))
+
+        if events is None:
+            last_id = broker.get_last_id()
+            yield format_event(last_id, 'reset', {})
+        elif events:
+            for last_id, data in events:
+                yield format_event(last_id, 'change', data)
+        else:
+            yield ': heartbeat\n\n'
+
+        if time.time() >= deadline:
+            return
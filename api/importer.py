@@ -0,0 +1,303 @@
+# Authored by Peter Garas for Ocom Software
+
+# Bulk project import
+#
+# Loads projects (with their libraries) from CSV or NDJSON files. The input is parsed as a stream and handled in
+# chunks: the library references of a chunk are resolved with a few queries, and its Project and ProjectLibrary rows
+# are inserted with one bulk insert each, in one transaction per chunk. Invalid rows are skipped and reported; they
+# do not stop the import.
+#
+# CSV files have a header line naming the project fields (see FIELDS). Their 'libraries' column holds
+# "<library>=<version>" pairs separated by ";", where <library> is a library id or description, e.g.
+# "Django=1.10.5;12=3.5.4".
+#
+# NDJSON files hold one project object per line. Their 'libraries' value is a list of objects with a 'version' and
+# a 'library_id', 'library' (id or description) or 'description' key, so the output of
+# "GET /api/projects/export/?output=ndjson" can be imported as is.
+
+import csv
+import json
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from . import cache, events, models, search, serializers, summaries, utils, validation
+
+FORMATS = ('csv', 'ndjson')
+
+FIELDS = ('name', 'active_start_date', 'active_end_date', 'description', 'client_name', 'git_url', 'testing_url',
+          'production_url')
+
+# rows whose errors are kept for the report; the remaining ones are only counted
+MAX_REPORTED_ERRORS = 100
+
+# library references looked up per query, within SQLite's limit on query parameters
+LOOKUP_BATCH_SIZE = 500
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+def get_format(name, default=None):
+    """
+    Returns the input format for a file name (or an explicit format name), or 'default' when it is not known.
+    """
+    name = (name or '').lower()
+
+    if name in FORMATS:
+        return name
+
+    if name.endswith('.csv'):
+        return 'csv'
+
+    if name.endswith('.ndjson') or name.endswith('.jsonl'):
+        return 'ndjson'
+
+    return default
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+
+    return value
+
+
+def _parse_library_cell(cell):
+    entries = []
+
+    for pair in (cell or '').split(';'):
+        if not pair.strip():
+            continue
+
+        library, separator, version = pair.rpartition('=')
+
+        if not separator:
+            raise ImportFileError("Invalid library entry \"{}\": must be \"<library>=<version>\"".format(pair))
+
+        entries.append({'library': library.strip(), 'version': version.strip()})
+
+    return entries
+
+
+def _iter_csv(lines):
+    reader = csv.DictReader(lines)
+
+    for row in reader:
+        row = dict((_text(key), _text(value)) for key, value in row.items() if key is not None)
+
+        try:
+            row['libraries'] = _parse_library_cell(row.get('libraries'))
+        except ImportFileError as err:
+            yield reader.line_num, None, {"detail": str(err)}
+            continue
+
+        # empty cells stand for missing values
+        if row.get('active_end_date') == '':
+            row['active_end_date'] = None
+
+        yield reader.line_num, row, None
+
+
+def _iter_ndjson(lines):
+    for line_number, line in enumerate(lines, 1):
+        line = _text(line).strip()
+
+        if not line:
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, {"detail": "Invalid JSON"}
+            continue
+
+        if not isinstance(row, dict) or not isinstance(row.get('libraries', []), list):
+            yield line_number, None, {"detail": "Invalid row: must be a project object"}
+            continue
+
+        yield line_number, row, None
+
+
+def iter_rows(lines, input_format):
+    """
+    Parses an iterable of input lines, yielding (line number, row, errors) for every project row. Either the row or
+    the errors are None.
+    """
+    if input_format == 'csv':
+        return _iter_csv(lines)
+
+    if input_format == 'ndjson':
+        return _iter_ndjson(lines)
+
+    raise ImportFileError("Invalid format: must be \"csv\" or \"ndjson\"")
+
+
+def _library_reference(entry):
+    # (library id, library description, version); the id or the description is None
+    if not isinstance(entry, dict):
+        return None, None, None
+
+    version = entry.get('version')
+    version = u'{}'.format(version).strip() if version is not None else ''
+
+    if entry.get('library_id') is not None:
+        reference = entry['library_id']
+    elif entry.get('library') is not None:
+        reference = entry['library']
+    else:
+        reference = entry.get('description')
+        return None, reference if isinstance(reference, basestring) else None, version
+
+    if isinstance(reference, int) or (isinstance(reference, basestring) and reference.isdigit()):
+        return int(reference), None, version
+
+    return None, reference if isinstance(reference, basestring) else None, version
+
+
+class ProjectImporter(object):
+    """
+    Imports project rows chunk by chunk. 'progress', when given, is called after every chunk with the number of
+    rows processed, imported and failed so far.
+    """
+
+    def __init__(self, chunk_size=None, progress=None):
+        self.chunk_size = chunk_size or getattr(settings, 'API_IMPORT_CHUNK_SIZE', 500)
+        self.progress = progress
+        self.processed = self.imported = self.failed = 0
+        self.errors = []
+        # a single serializer validates every row, so its fields are only built once
+        self.serializer = serializers.ProjectSerializer()
+
+    def _fail(self, line_number, errors):
+        self.failed += 1
+
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    def _validate(self, line_number, row, date_errors):
+        if date_errors:
+            self._fail(line_number, date_errors)
+            return None
+
+        data = dict((key, row.get(key)) for key in FIELDS if row.get(key) is not None)
+        data.setdefault('active_end_date', None)
+
+        try:
+            validated_data = self.serializer.run_validation(data)
+        except ValidationError as err:
+            self._fail(line_number, err.detail)
+            return None
+
+        entries = [_library_reference(entry) for entry in row.get('libraries') or []]
+
+        for library_id, description, version in entries:
+            if (library_id is None and not description) or not version:
+                self._fail(line_number, {"detail": "Invalid library entry: a library and a version are required"})
+                return None
+
+            if len(version) > models.ProjectLibrary._meta.get_field('version').max_length:
+                self._fail(line_number, {"detail": "Invalid library entry: version is too long"})
+                return None
+
+        return validated_data, entries
+
+    def _resolve_libraries(self, rows):
+        # the library ids and descriptions referenced by a chunk, looked up with a query per batch of references
+        ids, descriptions = set(), set()
+
+        for _, _, entries in rows:
+            for library_id, description, _ in entries:
+                if library_id is not None:
+                    ids.add(library_id)
+                else:
+                    descriptions.add(description)
+
+        existing_ids = set()
+        by_description = {}
+        ids, descriptions = list(ids), list(descriptions)
+
+        for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+            existing_ids.update(models.Library.objects.filter(pk__in=ids[start:start + LOOKUP_BATCH_SIZE])
+                                .values_list('id', flat=True))
+
+        for start in range(0, len(descriptions), LOOKUP_BATCH_SIZE):
+            # a description shared by several libraries resolves to the oldest one
+            libraries = models.Library.objects.filter(description__in=descriptions[start:start + LOOKUP_BATCH_SIZE])
+            by_description.update(libraries.order_by('-id').values_list('description', 'id'))
+
+        def resolve(library_id, description):
+            return library_id if library_id in existing_ids else by_description.get(description)
+
+        return resolve
+
+    def _save_chunk(self, chunk):
+        rows = []
+        date_errors = validation.validate_date_records([row for _, row in chunk])
+
+        for (line_number, row), errors in zip(chunk, date_errors):
+            validated = self._validate(line_number, row, errors)
+
+            if validated is not None:
+                rows.append((line_number, validated[0], validated[1]))
+
+        resolve = self._resolve_libraries(rows)
+        projects, libraries = [], []
+
+        for line_number, data, entries in rows:
+            resolved = [(resolve(library_id, description), version) for library_id, description, version in entries]
+
+            if any(library_id is None for library_id, _ in resolved):
+                self._fail(line_number, {"detail": "Invalid library entry: library not found"})
+                continue
+
+            projects.append(models.Project(**data))
+            libraries.append(resolved)
+
+        if projects:
+            with transaction.atomic():
+                projects = utils.bulk_create(models.Project, projects)
+                utils.bulk_insert_ignore(models.ProjectLibrary, (
+                    models.ProjectLibrary(project_id=project.pk, library_id=library_id, version=version)
+                    for project, entries in zip(projects, libraries) for library_id, version in entries))
+                # bulk_create() does not send model signals
+                cache.bump_version('project', 'projectlibrary')
+                search.reindex(models.Project, [project.pk for project in projects])
+                summaries.rebuild([project.pk for project in projects])
+                events.publish('project', 'saved', [project.pk for project in projects])
+
+            self.imported += len(projects)
+
+    def run(self, rows):
+        """
+        Imports the (line number, row, errors) tuples of iter_rows() and returns a summary of the import.
+        """
+        chunk = []
+
+        for line_number, row, errors in rows:
+            self.processed += 1
+
+            if errors is not None:
+                self._fail(line_number, errors)
+            else:
+                chunk.append((line_number, row))
+
+            if len(chunk) >= self.chunk_size:
+                self._save_chunk(chunk)
+                chunk = []
+
+                if self.progress:
+                    self.progress(self.processed, self.imported, self.failed)
+
+        if chunk:
+            self._save_chunk(chunk)
+
+        if self.progress:
+            self.progress(self.processed, self.imported, self.failed)
+
+        return {'processed': self.processed, 'imported': self.imported, 'failed': self.failed,
+                'errors': sorted(self.errors, key=lambda error: error['line'])}
+
+
+def import_projects(lines, input_format, chunk_size=None, progress=None):
+    return ProjectImporter(chunk_size, progress).run(iter_rows(lines, input_format))
@@ -0,0 +1,55 @@
+# Authored by Peter Garas for Ocom Software
+
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from api import validation
+
+
+def validate_date_entries_strptime(data):
+    # the datetime.strptime() based validation that api/validation.py replaced, kept as the baseline
+    for field_key in validation.DATE_FIELDS:
+        date_field = data.get(field_key)
+
+        if date_field is not None:
+            try:
+                datetime.strptime(date_field, '%Y-%m-%d')
+            except ValueError:
+                return False, {"detail": "Invalid format for {}: must be \"YYYY-mm-dd\"".format(field_key)}
+
+    return True, {}
+
+
+class Command(BaseCommand):
+    help = "Compares the records/sec of the strptime() based date validation and of api/validation.py."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=100000, help="number of synthetic records")
+        parser.add_argument('--repeat', type=int, default=3, help="runs per validator (the best one is reported)")
+
+    def _measure(self, label, count, validate, repeat):
+        best = None
+
+        for _ in range(repeat):
+            start = time.time()
+            validate()
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        self.stdout.write('{:<32} {:>10.0f} records/sec'.format(label, count / max(best, 1e-9)))
+
+    def handle(self, *args, **options):
+        # mostly valid records, with an open end date every third record and an invalid one every tenth
+        records = [{'active_start_date': '2017-{:02d}-{:02d}'.format(i % 12 + 1, i % 28 + 1),
+                    'active_end_date': None if i % 3 else '2018-01-01'} for i in range(options['records'])]
+
+        for record in records[::10]:
+            record['active_start_date'] = '2017-13-01'
+
+        count = len(records)
+        self._measure('strptime (per record)', count,
+                      lambda: [validate_date_entries_strptime(record) for record in records], options['repeat'])
+        self._measure('validate_dates (per record)', count,
+                      lambda: [validation.validate_dates(record) for record in records], options['repeat'])
+        self._measure('validate_date_records (batch)', count,
+                      lambda: validation.validate_date_records(records), options['repeat'])
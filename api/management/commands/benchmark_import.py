@@ -0,0 +1,62 @@
+# Authored by Peter Garas for Ocom Software
+
+import json
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api import importer, models, serializers, utils
+
+
+class Command(BaseCommand):
+    help = ("Compares the rows/sec of importing projects one at a time (as ProjectViewSet.create does) and of the "
+            "chunked bulk import. Each import runs on a throwaway copy of the database (see utils.scratch_database) and "
+            "commits as it would in production: once per project, or once per chunk.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=5000, help="number of synthetic projects")
+        parser.add_argument('--libraries', type=int, default=5, help="number of libraries per synthetic project")
+        parser.add_argument('--chunk-size', type=int, help="rows per transaction (default API_IMPORT_CHUNK_SIZE)")
+
+    def _lines(self, project_count, libraries):
+        for i in range(project_count):
+            yield json.dumps({'name': 'Benchmark project {}'.format(i), 'active_start_date': '2017-01-01',
+                              'active_end_date': None, 'client_name': 'Client',
+                              'git_url': 'https://example.com/{}.git'.format(i),
+                              'libraries': [{'library': library.description, 'version': '1.0'}
+                                            for library in libraries]})
+
+    def _import_one_by_one(self, lines):
+        # the statements of a ProjectViewSet.create call per project
+        for line in lines:
+            row = json.loads(line)
+            entries = row.pop('libraries')
+            serializer = serializers.ProjectSerializer(data=row)
+            serializer.is_valid(raise_exception=True)
+
+            with transaction.atomic():
+                project = serializer.save()
+
+                for entry in entries:
+                    library = models.Library.objects.get(description=entry['library'])
+                    models.ProjectLibrary.objects.create(project=project, library=library, version=entry['version'])
+
+    def _measure(self, label, options, run):
+        # every strategy starts from the same database, with its own transactions
+        with utils.scratch_database():
+            models.Library.objects.bulk_create(
+                models.Library(description='Benchmark library {}'.format(i), active_start_date=date(2017, 1, 1))
+                for i in range(options['libraries']))
+            libraries = list(models.Library.objects.order_by('-id')[:options['libraries']])
+            lines = self._lines(options['projects'], libraries)
+
+            start = time.time()
+            run(lines)
+            elapsed = time.time() - start
+
+        self.stdout.write('{:<32} {:>10.0f} rows/sec'.format(label, options['projects'] / max(elapsed, 1e-9)))
+
+    def handle(self, *args, **options):
+        self._measure('one project at a time', options, self._import_one_by_one)
+        self._measure('chunked bulk import', options,
+                      lambda lines: importer.import_projects(lines, 'ndjson', options['chunk_size']))
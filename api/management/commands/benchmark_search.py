@@ -0,0 +1,83 @@
+# Authored by Peter Garas for Ocom Software
+
+import random
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api import models, search
+
+WORDS = ('django', 'rest', 'framework', 'http', 'client', 'server', 'async', 'cache', 'queue', 'task', 'image',
+         'parser', 'json', 'xml', 'crypto', 'auth', 'oauth', 'database', 'driver', 'orm', 'template', 'testing',
+         'mock', 'logging', 'metrics', 'storage', 'search', 'index', 'stream', 'socket', 'email', 'payment')
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Measures the latency of library searches with the full-text search index and with substring matching. "
+            "Synthetic libraries are created inside a transaction that is rolled back afterwards, so the database is "
+            "left unchanged. Use --rows 1000000 for the 1M row figures (populating takes a few minutes).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help="number of synthetic libraries")
+        parser.add_argument('--queries', type=int, default=50, help="number of searches per method")
+        parser.add_argument('--page-size', type=int, default=100, help="results loaded per search")
+
+    def _name(self, number):
+        # a word that only one synthetic library has
+        return 'lib{}x'.format(number)
+
+    def _populate(self, count):
+        generator = random.Random(0)
+        batch_size = 10000
+
+        for start in range(0, count, batch_size):
+            models.Library.objects.bulk_create(
+                models.Library(description='{} {}'.format(' '.join(generator.sample(WORDS, 4)), self._name(i)),
+                               active_start_date=date(2017, 1, 1))
+                for i in range(start, min(start + batch_size, count)))
+
+        search.reindex(models.Library)
+
+    def _measure(self, label, queries, run):
+        timings = []
+
+        for text in queries:
+            start = time.time()
+            run(text)
+            timings.append(time.time() - start)
+
+        timings.sort()
+        self.stdout.write('{:<40} p50 {:>8.1f} ms   p95 {:>8.1f} ms'.format(
+            label, timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000))
+
+    def handle(self, *args, **options):
+        generator = random.Random(1)
+        page_size = options['page_size']
+        # common words (matching many libraries, which are ranked) and names (matching a single library)
+        workloads = (
+            ('common words', [' '.join(generator.sample(WORDS, generator.randint(1, 2)))
+                              for _ in range(options['queries'])]),
+            ('names', [self._name(generator.randrange(options['rows'])) for _ in range(options['queries'])]),
+        )
+
+        try:
+            with transaction.atomic():
+                start = time.time()
+                self._populate(options['rows'])
+                self.stdout.write('Populated {} libraries in {:.1f}s'.format(options['rows'], time.time() - start))
+
+                libraries = models.Library.objects.all()
+
+                for workload, queries in workloads:
+                    self._measure('full-text index, {}'.format(workload), queries,
+                                  lambda text: list(search.search(libraries, text)[:page_size]))
+                    self._measure('substring matching, {}'.format(workload), queries,
+                                  lambda text: list(search.substring_search(libraries, search.get_words(text))
+                                                    [:page_size]))
+                raise Rollback
+        except Rollback:
+            pass
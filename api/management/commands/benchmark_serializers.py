@@ -0,0 +1,66 @@
+# Authored by Peter Garas for Ocom Software
+
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api import models, serializers, viewsets
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Compares the objects/sec of the DRF list serializers and the fast-path serializers. Synthetic rows are "
+            "created inside a transaction that is rolled back afterwards, so the database is left unchanged.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=2000, help="number of synthetic projects")
+        parser.add_argument('--libraries', type=int, default=5, help="number of libraries per synthetic project")
+        parser.add_argument('--repeat', type=int, default=3, help="runs per serializer (the best one is reported)")
+
+    def _populate(self, project_count, library_count):
+        models.Library.objects.bulk_create(
+            models.Library(description='Benchmark library {}'.format(i), active_start_date=date(2017, 1, 1))
+            for i in range(library_count))
+        libraries = list(models.Library.objects.order_by('-id')[:library_count])
+        models.Project.objects.bulk_create(
+            models.Project(name='Benchmark project {}'.format(i), active_start_date=date(2017, 1, 1),
+                           client_name='Client', git_url='https://example.com/{}.git'.format(i))
+            for i in range(project_count))
+        project_ids = models.Project.objects.order_by('-id').values_list('id', flat=True)[:project_count]
+        models.ProjectLibrary.objects.bulk_create(
+            models.ProjectLibrary(project_id=project_id, library=library, version='1.0')
+            for project_id in project_ids for library in libraries)
+
+    def _measure(self, label, count, serialize, repeat):
+        best = None
+
+        for _ in range(repeat):
+            start = time.time()
+            serialize()
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        self.stdout.write('{:<32} {:>10.0f} objects/sec'.format(label, count / max(best, 1e-9)))
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._populate(options['projects'], options['libraries'])
+                libraries = models.Library.objects.order_by('id')
+                projects = viewsets.ProjectViewSet().get_queryset().order_by('id')
+                fast_projects = serializers.FastProjectSerializer.get_rows(projects)
+
+                self._measure('LibrarySerializer', libraries.count(), lambda: serializers.LibrarySerializer(
+                    libraries.all(), many=True).data, options['repeat'])
+                self._measure('FastLibrarySerializer', libraries.count(), lambda: serializers.FastLibrarySerializer(
+                    serializers.FastLibrarySerializer.get_rows(libraries)).data, options['repeat'])
+                self._measure('ProjectSerializer', projects.count(), lambda: serializers.ProjectSerializer(
+                    projects.all(), many=True).data, options['repeat'])
+                self._measure('FastProjectSerializer', projects.count(), lambda: serializers.FastProjectSerializer(
+                    fast_projects.all()).data, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,114 @@
+# Authored by Peter Garas for Ocom Software
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# rollback journal settings of a stock sqlite3 connection
+DEFAULT_PRAGMAS = (('journal_mode', 'DELETE'), ('synchronous', 'FULL'), ('busy_timeout', 5000))
+
+
+class Command(BaseCommand):
+    help = ("Compares read latency while a writer keeps committing project edits, on a copy of the SQLite database "
+            "with the default rollback journal and on one with the PRAGMAS of the sqlite profile (see "
+            "config/settings.py). The configured database itself is not touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5, help="duration of each run")
+        parser.add_argument('--readers', type=int, default=4, help="number of concurrent reader threads")
+        parser.add_argument('--hold', type=float, default=0.02,
+                            help="seconds the writer keeps each write transaction open")
+
+    def _connect(self, path, pragmas):
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+
+        for name, value in pragmas:
+            connection.execute('PRAGMA {} = {}'.format(name, value))
+
+        return connection
+
+    def _writer(self, path, pragmas, hold, stop, counts):
+        connection = self._connect(path, pragmas)
+
+        while not stop.is_set():
+            # a rollback journal writer needs the exclusive lock (shutting out readers) to commit, or earlier when its
+            # changes outgrow the page cache; EXCLUSIVE takes it up front. In WAL mode it is the same as IMMEDIATE.
+            connection.execute('BEGIN EXCLUSIVE')
+            connection.execute("UPDATE api_project SET description = description WHERE id IN "
+                               "(SELECT id FROM api_project LIMIT 10)")
+            connection.execute("UPDATE api_library SET description = description WHERE id IN "
+                               "(SELECT id FROM api_library LIMIT 10)")
+            time.sleep(hold)
+            connection.execute('COMMIT')
+            counts['writes'] += 1
+
+        connection.close()
+
+    def _reader(self, path, pragmas, stop, latencies, errors):
+        connection = self._connect(path, pragmas)
+
+        while not stop.is_set():
+            start = time.time()
+
+            try:
+                connection.execute('SELECT p.id, l.description, pl.version FROM api_project p '
+                                   'JOIN api_projectlibrary pl ON pl.project_id = p.id '
+                                   'JOIN api_library l ON l.id = pl.library_id').fetchall()
+            except sqlite3.OperationalError:
+                errors.append(1)
+            else:
+                latencies.append(time.time() - start)
+
+        connection.close()
+
+    def _run(self, path, pragmas, options):
+        stop = threading.Event()
+        counts = {'writes': 0}
+        latencies, errors = [], []
+        threads = [threading.Thread(target=self._writer, args=(path, pragmas, options['hold'], stop, counts))]
+        threads += [threading.Thread(target=self._reader, args=(path, pragmas, stop, latencies, errors))
+                    for _ in range(options['readers'])]
+
+        for thread in threads:
+            thread.start()
+
+        time.sleep(options['seconds'])
+        stop.set()
+
+        for thread in threads:
+            thread.join()
+
+        latencies.sort()
+        return {
+            'writes': counts['writes'],
+            'reads': len(latencies),
+            'errors': len(errors),
+            'stalled': len([latency for latency in latencies if latency >= options['hold'] / 2]),
+            'p50': latencies[len(latencies) // 2] * 1000 if latencies else 0,
+            'max': latencies[-1] * 1000 if latencies else 0,
+        }
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+
+        if 'sqlite3' not in database['ENGINE']:
+            self.stderr.write("The configured database is not SQLite (see DJANGO_DB_PROFILE).")
+            return
+
+        tuned_pragmas = tuple(database.get('PRAGMAS', {}).items())
+        directory = tempfile.mkdtemp()
+
+        try:
+            for label, pragmas in (('rollback journal', DEFAULT_PRAGMAS), ('tuned (PRAGMAS)', tuned_pragmas)):
+                path = os.path.join(directory, label.split()[0] + '.sqlite3')
+                shutil.copy(database['NAME'], path)
+                result = self._run(path, pragmas, options)
+                self.stdout.write('{:<18} {writes:>6} writes {reads:>8} reads ({stalled} stalled, {errors} failed)  '
+                                  'read latency p50 {p50:.2f} ms, max {max:.2f} ms'.format(label, **result))
+        finally:
+            shutil.rmtree(directory)
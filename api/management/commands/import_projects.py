@@ -0,0 +1,43 @@
+# Authored by Peter Garas for Ocom Software
+
+import io
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api import importer
+
+
+class Command(BaseCommand):
+    help = ("Imports projects (with their libraries) from a CSV or NDJSON file, in chunks of rows that are saved in "
+            "one transaction each. See api/importer.py for the file formats.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="the CSV (.csv) or NDJSON (.ndjson or .jsonl) file to import")
+        parser.add_argument('--input', choices=importer.FORMATS, help="the file format, if not given by its name")
+        parser.add_argument('--chunk-size', type=int, help="rows per transaction (default API_IMPORT_CHUNK_SIZE)")
+
+    def handle(self, *args, **options):
+        input_format = importer.get_format(options['input'] or options['path'])
+
+        if input_format is None:
+            raise CommandError("Unknown file format: use --input csv or --input ndjson")
+
+        start = time.time()
+
+        def progress(processed, imported, failed):
+            self.stdout.write('{:>10} rows processed, {:>10} imported, {:>8} failed ({:.0f} rows/sec)'.format(
+                processed, imported, failed, processed / max(time.time() - start, 1e-9)))
+
+        with io.open(options['path'], 'rb') as lines:
+            try:
+                result = importer.import_projects(lines, input_format, options['chunk_size'], progress)
+            except importer.ImportFileError as err:
+                raise CommandError(str(err))
+
+        for error in result['errors']:
+            self.stderr.write('line {}: {}'.format(error['line'], error['errors']))
+
+        if result['failed'] > len(result['errors']):
+            self.stderr.write('... and {} more failed rows'.format(result['failed'] - len(result['errors'])))
+
+        self.stdout.write('Imported {} of {} projects in {:.1f}s'.format(result['imported'], result['processed'],
+                                                                         time.time() - start))
@@ -0,0 +1,103 @@
+# Authored by Peter Garas for Ocom Software
+
+import socket
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.six.moves.urllib.error import URLError
+from django.utils.six.moves.urllib.parse import urlsplit
+from django.utils.six.moves.urllib.request import urlopen
+
+
+class Command(BaseCommand):
+    help = ("Measures how a running server copes with slow clients: it holds --slow-clients connections open, each "
+            "sending its request headers one line per second, while --probes regular requests are made to the same "
+            "URL. Run it against the WSGI and the ASGI deployment (see README.md) to compare them: a server with a "
+            "worker thread per connection stops answering once the slow clients hold all of its threads.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/projects/', help="URL to request")
+        parser.add_argument('--slow-clients', type=int, default=100, help="number of slow connections held open")
+        parser.add_argument('--probes', type=int, default=50, help="number of regular requests")
+        parser.add_argument('--concurrency', type=int, default=10, help="regular requests made at a time")
+        parser.add_argument('--timeout', type=float, default=10, help="seconds before a regular request fails")
+
+    def _open_slow_clients(self, url, count):
+        parts = urlsplit(url)
+        address = (parts.hostname, parts.port or 80)
+        request = 'GET {} HTTP/1.1\r\nHost: {}\r\n'.format(parts.path or '/', parts.netloc).encode('ascii')
+        connections = []
+
+        for _ in range(count):
+            try:
+                connection = socket.create_connection(address, timeout=5)
+                connection.sendall(request)
+            except socket.error:
+                break
+
+            connections.append(connection)
+
+        return connections
+
+    def _trickle(self, connections, stop):
+        # one more header line per second, so the requests never end
+        while not stop.wait(1):
+            for connection in list(connections):
+                try:
+                    connection.sendall(b'X-Slow-Client: 1\r\n')
+                except socket.error:
+                    connections.remove(connection)
+
+    def _probe(self, url, count, timeout, results):
+        for _ in range(count):
+            start = time.time()
+
+            try:
+                urlopen(url, timeout=timeout).read()
+            except (URLError, socket.error):
+                results.append(None)
+            else:
+                results.append(time.time() - start)
+
+    def handle(self, *args, **options):
+        url, concurrency = options['url'], max(1, options['concurrency'])
+
+        try:
+            urlopen(url, timeout=options['timeout']).read()
+        except (URLError, socket.error) as err:
+            raise CommandError("{} is not answering: {}".format(url, err))
+
+        connections = self._open_slow_clients(url, options['slow_clients'])
+        stop = threading.Event()
+        trickle = threading.Thread(target=self._trickle, args=(connections, stop))
+        trickle.start()
+        results = []
+
+        try:
+            start = time.time()
+            probes = [threading.Thread(target=self._probe, args=(
+                url, options['probes'] // concurrency + (1 if index < options['probes'] % concurrency else 0),
+                options['timeout'], results)) for index in range(concurrency)]
+
+            for probe in probes:
+                probe.start()
+
+            for probe in probes:
+                probe.join()
+
+            elapsed = time.time() - start
+            held = len(connections)
+        finally:
+            stop.set()
+            trickle.join()
+
+            for connection in connections:
+                connection.close()
+
+        timings = sorted(timing for timing in results if timing is not None)
+        self.stdout.write('{} slow connections held open ({} requested)'.format(held, options['slow_clients']))
+        self.stdout.write('{} of {} requests answered in {:.2f}s'.format(len(timings), len(results), elapsed))
+
+        if timings:
+            self.stdout.write('latency p50 {:.1f} ms   p95 {:.1f} ms'.format(
+                timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000))
@@ -0,0 +1,83 @@
+# Authored by Peter Garas for Ocom Software
+
+import threading
+import time
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from api import models, summaries, utils, versions
+
+
+class Command(BaseCommand):
+    help = ("Measures project edit throughput with concurrent writer threads against the configured database "
+            "profile (see DJANGO_DB_PROFILE in config/settings.py). It runs on a throwaway database: a copy of the SQLite "
+            "file, or a test database created like the test runner does on other vendors. The configured database "
+            "itself is not touched.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="number of concurrent writer threads")
+        parser.add_argument('--writes', type=int, default=200, help="number of edits per thread")
+
+    def _edit(self, project_id, entry_id, count):
+        # the same statements as a ProjectViewSet.edit call that updates a library version
+        with transaction.atomic():
+            project = models.Project.objects.get(pk=project_id)
+            project.description = 'Load test edit {}'.format(count)
+            project.save()
+            version = '1.{}'.format(count)
+            models.ProjectLibrary.objects.filter(pk=entry_id).update(version=version,
+                                                                     version_key=versions.version_key(version),
+                                                                     updated_at=timezone.now())
+            summaries.rebuild([project_id])
+
+    def _writer(self, project_id, entry_id, writes, results):
+        done = failed = 0
+
+        try:
+            for count in range(writes):
+                try:
+                    self._edit(project_id, entry_id, count)
+                    done += 1
+                except DatabaseError:
+                    # e.g. "database is locked" on SQLite
+                    failed += 1
+        finally:
+            results.append((done, failed))
+            connection.close()
+
+    def handle(self, *args, **options):
+        with utils.scratch_database():
+            self._run(options)
+
+    def _run(self, options):
+        library = models.Library.objects.create(description='Load test library', active_start_date=date(2017, 1, 1))
+        targets = []
+
+        for i in range(options['threads']):
+            project = models.Project.objects.create(name='Load test project {}'.format(i),
+                                                    active_start_date=date(2017, 1, 1), client_name='Load test',
+                                                    git_url='https://example.com/{}.git'.format(i))
+            entry = models.ProjectLibrary.objects.create(project=project, library=library, version='1.0')
+            targets.append((project.id, entry.id))
+
+        results = []
+        threads = [threading.Thread(target=self._writer, args=(project_id, entry_id, options['writes'], results))
+                   for project_id, entry_id in targets]
+
+        start = time.time()
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.time() - start
+
+        done = sum(result[0] for result in results)
+        failed = sum(result[1] for result in results)
+        self.stdout.write('profile: {} ({})'.format(settings.DATABASE_PROFILE, connection.vendor))
+        self.stdout.write('{} threads, {} edits in {:.2f}s: {:.0f} edits/sec, {} failed'.format(
+            len(threads), done, elapsed, done / max(elapsed, 1e-9), failed))
@@ -0,0 +1,14 @@
+# Authored by Peter Garas for Ocom Software
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api import models, sync
+
+
+class Command(BaseCommand):
+    help = ("Removes the deletion records (tombstones) older than API_SYNC_RETENTION_DAYS, which sync tokens that old "
+            "are not accepted for any more.")
+
+    def handle(self, *args, **options):
+        count, _ = models.Tombstone.objects.filter(deleted_at__lt=timezone.now() - sync.get_retention()).delete()
+        self.stdout.write('Removed {} tombstones'.format(count))
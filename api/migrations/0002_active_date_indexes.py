@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-18 01:55
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='library',
+            index_together=set([('active_start_date', 'active_end_date'), ('active_end_date', 'active_start_date')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='project',
+            index_together=set([('active_start_date', 'active_end_date'), ('active_end_date', 'active_start_date')]),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-18 02:14
+from __future__ import unicode_literals
+
+import api.versions
+from django.db import migrations
+from django.db.models import Case, Value, When
+
+
+def backfill_version_keys(apps, schema_editor):
+    ProjectLibrary = apps.get_model('api', 'ProjectLibrary')
+    entries = ProjectLibrary.objects.using(schema_editor.connection.alias)
+    rows = list(entries.values_list('id', 'version'))
+
+    # one UPDATE per batch of rows
+    for start in range(0, len(rows), 100):
+        batch = rows[start:start + 100]
+        keys = [When(pk=pk, then=Value(api.versions.version_key(version))) for pk, version in batch]
+        entries.filter(pk__in=[pk for pk, _ in batch]).update(
+            version_key=Case(*keys, output_field=ProjectLibrary._meta.get_field('version_key')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_library_version_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectlibrary',
+            name='version_key',
+            field=api.versions.VersionKeyField(db_index=True, editable=False, max_length=254, null=True),
+        ),
+        migrations.RunPython(backfill_version_keys, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='projectlibrary',
+            index_together=set([('library', 'version_key'), ('library', 'version', 'project')]),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# the search index as of this migration: its fields per model, and their weights on PostgreSQL (see api/search.py,
+# which keeps the index up to date afterwards)
+SEARCH_FIELDS = {
+    'Library': ('description',),
+    'Project': ('name', 'client_name', 'description'),
+}
+POSTGRESQL_WEIGHTS = ('A', 'B', 'C')
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+
+    for model_name, fields in SEARCH_FIELDS.items():
+        model = apps.get_model('api', model_name)
+        table = '{}_search'.format(model._meta.db_table)
+        columns = [qn(model._meta.get_field(field).column) for field in fields]
+
+        if connection.vendor == 'sqlite':
+            schema_editor.execute('CREATE VIRTUAL TABLE {} USING fts5({})'.format(qn(table), ', '.join(fields)))
+            schema_editor.execute('INSERT INTO {} (rowid, {}) SELECT id, {} FROM {}'.format(
+                qn(table), ', '.join(fields), ', '.join(columns), qn(model._meta.db_table)))
+        elif connection.vendor == 'postgresql':
+            document = ' || '.join("setweight(to_tsvector('simple', coalesce({}, '')), '{}')".format(column, weight)
+                                   for column, weight in zip(columns, POSTGRESQL_WEIGHTS))
+            schema_editor.execute('CREATE TABLE {} (id integer PRIMARY KEY, document tsvector NOT NULL)'.format(
+                qn(table)))
+            schema_editor.execute('CREATE INDEX {} ON {} USING GIN (document)'.format(
+                qn('{}_document'.format(table)), qn(table)))
+            schema_editor.execute('INSERT INTO {} (id, document) SELECT id, {} FROM {}'.format(
+                qn(table), document, qn(model._meta.db_table)))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+
+    for model_name in SEARCH_FIELDS:
+        table = '{}_search'.format(apps.get_model('api', model_name)._meta.db_table)
+        schema_editor.execute('DROP TABLE IF EXISTS {}'.format(schema_editor.connection.ops.quote_name(table)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_version_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
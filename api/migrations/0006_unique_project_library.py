@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-18 02:20
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Min
+
+
+def remove_duplicate_entries(apps, schema_editor):
+    # keeps the oldest of the entries with the same project, library and version
+    ProjectLibrary = apps.get_model('api', 'ProjectLibrary')
+    entries = ProjectLibrary.objects.using(schema_editor.connection.alias)
+    kept = entries.values('project', 'library', 'version').annotate(kept_id=Min('id')).values('kept_id')
+    entries.exclude(pk__in=kept).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_entries, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='projectlibrary',
+            unique_together=set([('project', 'library', 'version')]),
+        ),
+    ]
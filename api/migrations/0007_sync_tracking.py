@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-18 02:22
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_unique_project_library'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=100, verbose_name=b'Model Name')),
+                ('object_id', models.IntegerField(verbose_name=b'Object Id')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=b'Deleted At')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='library',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name=b'Last Updated'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name=b'Last Updated'),
+        ),
+        migrations.AddField(
+            model_name='projectlibrary',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name=b'Last Updated'),
+        ),
+        migrations.AlterIndexTogether(
+            name='tombstone',
+            index_together=set([('model_name', 'deleted_at')]),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-18 02:36
+from __future__ import unicode_literals
+
+import json
+from collections import OrderedDict
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_summaries(apps, schema_editor):
+    # the same summaries as api.summaries.rebuild(), for every project
+    Project = apps.get_model('api', 'Project')
+    ProjectLibrary = apps.get_model('api', 'ProjectLibrary')
+    ProjectSummary = apps.get_model('api', 'ProjectSummary')
+    alias = schema_editor.connection.alias
+    libraries = OrderedDict((project_id, []) for project_id in
+                            Project.objects.using(alias).order_by('id').values_list('id', flat=True))
+
+    for project_id, entry_id, library_id, description, version in ProjectLibrary.objects.using(alias).order_by(
+            'id').values_list('project_id', 'id', 'library_id', 'library__description', 'version'):
+        libraries[project_id].append(OrderedDict((
+            ('id', entry_id),
+            ('library_id', library_id),
+            ('description', description),
+            ('version', version),
+        )))
+
+    ProjectSummary.objects.using(alias).bulk_create((
+        ProjectSummary(project_id=project_id, library_count=len(entries),
+                       libraries=json.dumps(entries, separators=(',', ':')))
+        for project_id, entries in libraries.items()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectSummary',
+            fields=[
+                ('project', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='summary', serialize=False, to='api.Project', verbose_name=b'Project')),
+                ('library_count', models.PositiveIntegerField(default=0, verbose_name=b'Library Count')),
+                ('libraries', models.TextField(default=b'[]', verbose_name=b'Libraries')),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-18 03:18
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_project_summary'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='projectlibrary',
+            index_together=set([('library', 'version_key', 'version', 'project')]),
+        ),
+    ]
@@ -1,12 +1,56 @@
 # Authored by Peter Garas for Ocom Software
 
+from datetime import date
 from django.db import models
+from django.db.models import Q
+from .versions import VersionKeyField
+
+
+class ActiveDateQuerySet(models.QuerySet):
+    """
+    Filters for models with an 'active_start_date'/'active_end_date' window. A record is active on a given date if
+    its active start date is on or before that date and its active end date is on or after it (or is null).
+    """
+
+    def active_on(self, on_date=None):
+        on_date = on_date or date.today()
+        return self.filter(Q(active_start_date__lte=on_date),
+                           Q(active_end_date__gte=on_date) | Q(active_end_date__isnull=True))
+
+    def inactive_on(self, on_date=None):
+        on_date = on_date or date.today()
+        return self.filter(Q(active_start_date__gt=on_date) | Q(active_end_date__lt=on_date))
+
+    def active_between(self, start_date, end_date):
+        # any record whose active window overlaps [start_date, end_date]
+        return self.filter(Q(active_start_date__lte=end_date),
+                           Q(active_end_date__gte=start_date) | Q(active_end_date__isnull=True))
+
+
+# The indexes of the models filtered with ActiveDateQuerySet: (start, end) serves "active on date X" as a range scan
+# on the start date with the end date checked from the index itself, including the null end date case; (end, start)
+# serves the "ended before date X" half of the inactive filter.
+ACTIVE_DATE_INDEXES = [
+    ('active_start_date', 'active_end_date'),
+    ('active_end_date', 'active_start_date'),
+]
 
 
 class Library(models.Model):
     description = models.TextField("Description")
     active_start_date = models.DateField("Active Start Date")
     active_end_date = models.DateField("Active End Date", blank=True, null=True)
+    updated_at = models.DateTimeField("Last Updated", auto_now=True, db_index=True)
+
+    objects = ActiveDateQuerySet.as_manager()
+
+    class Meta:
+        index_together = ACTIVE_DATE_INDEXES
+
+    def __init__(self, *args, **kwargs):
+        super(Library, self).__init__(*args, **kwargs)
+        # the description as loaded (None when deferred), so that saves keeping it leave the project summaries alone
+        self._loaded_description = self.__dict__.get('description')
 
     def __str__(self):
         return self.name
@@ -23,6 +67,13 @@ class Project(models.Model):
     production_url = models.URLField("Production URL", blank=True)
     libraries = models.ManyToManyField(Library, through='ProjectLibrary', verbose_name="Project Library",
                                        blank=True)
+    # also touched when the project's library entries change (see api/signals.py)
+    updated_at = models.DateTimeField("Last Updated", auto_now=True, db_index=True)
+
+    objects = ActiveDateQuerySet.as_manager()
+
+    class Meta:
+        index_together = ACTIVE_DATE_INDEXES
 
     def __str__(self):
         return self.name
@@ -32,3 +83,47 @@ class ProjectLibrary(models.Model):
     library = models.ForeignKey(Library, verbose_name="Library")
     project = models.ForeignKey(Project, verbose_name="Project")
     version = models.CharField("Version Number", max_length=254)
+    # the sortable form of 'version' (see api/versions.py), kept in sync on save
+    version_key = VersionKeyField(db_index=True)
+    updated_at = models.DateTimeField("Last Updated", auto_now=True, db_index=True)
+
+    class Meta:
+        # serves "which projects use library X, at which versions" from the index alone, in version order; and
+        # version range filters for a library as a range scan
+        index_together = [
+            ('library', 'version_key', 'version', 'project'),
+        ]
+        # a project lists each version of a library once
+        unique_together = [
+            ('project', 'library', 'version'),
+        ]
+
+
+class ProjectSummary(models.Model):
+    """
+    A project's library entries, denormalized for the project list (see api/summaries.py): their number, and the
+    project's 'libraries' as the API lists them, as JSON. It is rebuilt whenever the entries or their libraries change,
+    and removed with the project (see api/signals.py), so it has no database constraint that would order the deletes.
+    """
+
+    project = models.OneToOneField(Project, primary_key=True, related_name='summary', on_delete=models.DO_NOTHING,
+                                   db_constraint=False, verbose_name="Project")
+    library_count = models.PositiveIntegerField("Library Count", default=0)
+    libraries = models.TextField("Libraries", default='[]')
+
+
+class Tombstone(models.Model):
+    """
+    Records the deletion of a Library, Project or ProjectLibrary row, so that clients syncing their copy of the data
+    (see api/sync.py) learn about it. Tombstones older than API_SYNC_RETENTION_DAYS may be removed with the
+    prune_tombstones management command.
+    """
+
+    model_name = models.CharField("Model Name", max_length=100)
+    object_id = models.IntegerField("Object Id")
+    deleted_at = models.DateTimeField("Deleted At", auto_now_add=True, db_index=True)
+
+    class Meta:
+        index_together = [
+            ('model_name', 'deleted_at'),
+        ]
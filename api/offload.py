@@ -0,0 +1,64 @@
+# Authored by Peter Garas for Ocom Software
+
+# Offloaded list requests
+#
+# Under the ASGI deployment (see config/asgi.py), a worker process handles one channel message at a time: while it
+# reads and serializes a library or project list, the requests queued behind it wait. With API_LIST_THREADS set, the
+# list requests are handed to a pool of that many threads per worker (see config/routing.py) and the worker goes on
+# with the next message straight away; at most API_LIST_THREADS lists are built at a time per worker, each thread
+# with its own database connection (see POOL_MAX_SIZE in config/backends/postgresql_pool).
+#
+# Under WSGI, every request already has a server thread of its own, which would only wait for a pool thread: the
+# views never use the pool there.
+
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is None and getattr(settings, 'API_LIST_THREADS', 0):
+            _pool = ThreadPool(settings.API_LIST_THREADS)
+
+    return _pool
+
+
+def reset_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool.join()
+
+        _pool = None
+
+
+def _call(func, args):
+    try:
+        func(*args)
+    except Exception:
+        # nobody waits for the result
+        logger.exception("Offloaded call failed")
+
+
+def submit(func, *args):
+    """
+    Calls func(*args) in the thread pool and returns without waiting for it, or calls it right away when there is
+    no pool (API_LIST_THREADS is 0).
+    """
+    pool = get_pool()
+
+    if pool is None:
+        func(*args)
+    else:
+        pool.apply_async(_call, (func, args))
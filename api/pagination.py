@@ -0,0 +1,130 @@
+# Authored by Peter Garas for Ocom Software
+
+import json
+from base64 import b64decode, b64encode
+from collections import defaultdict, OrderedDict
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import six
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination over the record id.
+
+    Every page is fetched with "WHERE id > <last id of the previous page> ORDER BY id LIMIT <page size + 1>", so the
+    cost of a page does not depend on how deep into the list it is, and rows inserted while a client is paging do
+    not shift the pages that follow.
+
+    The page size defaults to API_PAGE_SIZE and can be changed per request with the 'page_size' query parameter, up
+    to API_MAX_PAGE_SIZE.
+    """
+
+    ordering = 'id'
+    page_size = getattr(settings, 'API_PAGE_SIZE', 100)
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param)
+
+        try:
+            page_size = int(page_size)
+        except (TypeError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, getattr(settings, 'API_MAX_PAGE_SIZE', page_size))
+
+
+class VersionGroupPagination(KeysetPagination):
+    """
+    Cursor pagination over the versions of a library's project entries, where every result is a version with the
+    projects using it.
+
+    Versions come in version order, by their sort key (see api/versions.py) and then by the version string, which
+    tells apart versions with the same key ("1.2" and "v1.2"); versions without a key come last, by their string. The
+    cursor holds the key and the version of the last result of the previous page.
+
+    A page is loaded with a single query: the entries of the next <page size + 1> versions after the cursor, and of
+    the first <page size + 1> versions without a key while the versions with one last. Pages only go forward, so
+    there is no 'previous' link.
+    """
+
+    def _decode_position(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if encoded is None:
+            return None
+
+        try:
+            key, version = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(version, six.string_types) or not isinstance(key, (six.string_types, type(None))):
+            raise NotFound(self.invalid_cursor_message)
+
+        return key, version
+
+    def _next_versions(self, entries, page_size, position):
+        versions = entries.values('version_key', 'version').annotate(entry_count=Count('id'))
+        versions = versions.order_by('version_key', 'version').values_list('version', flat=True)
+        unkeyed = versions.filter(version_key__isnull=True)
+
+        if position is None:
+            keyed = versions.filter(version_key__isnull=False)
+        elif position[0] is None:
+            return Q(version__in=unkeyed.filter(version__gt=position[1])[:page_size + 1])
+        else:
+            key, version = position
+            keyed = versions.filter(Q(version_key__gt=key) | Q(version_key=key, version__gt=version))
+
+        return Q(version__in=keyed[:page_size + 1]) | Q(version__in=unkeyed[:page_size + 1])
+
+    def paginate_entries(self, entries, request):
+        self.base_url = request.build_absolute_uri()
+        self.next_position = None
+        page_size = self.get_page_size(request)
+        next_versions = self._next_versions(entries, page_size, self._decode_position(request))
+        project_ids = defaultdict(set)
+
+        for key, version, project_id in entries.filter(next_versions).values_list('version_key', 'version',
+                                                                                  'project_id'):
+            project_ids[key, version].add(project_id)
+
+        positions = sorted(project_ids, key=lambda position: (position[0] is None, position))
+        groups = [OrderedDict((('version', version), ('count', len(project_ids[key, version])),
+                               ('project_ids', sorted(project_ids[key, version]))))
+                  for key, version in positions[:page_size]]
+
+        if len(positions) > page_size:
+            self.next_position = positions[page_size - 1]
+
+        return groups
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+
+        encoded = b64encode(json.dumps(self.next_position).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict((('next', self.get_next_link()), ('previous', None), ('results', data))))
+
+
+class SearchPagination(LimitOffsetPagination):
+    """
+    Offset pagination for search results, which are ordered by relevance rather than by id. The page size is set
+    like on KeysetPagination, with the 'page_size' query parameter.
+    """
+
+    default_limit = getattr(settings, 'API_PAGE_SIZE', 100)
+    limit_query_param = 'page_size'
+    max_limit = getattr(settings, 'API_MAX_PAGE_SIZE', None)
@@ -0,0 +1,148 @@
+# Authored by Peter Garas for Ocom Software
+
+# Full-text search
+#
+# The searchable text of libraries and projects (see SEARCH_FIELDS) is copied to a search index table per model,
+# created by the 0005_search_index migration:
+#
+#   - SQLite: an FTS5 virtual table whose rowid is the record id, ranked with bm25();
+#   - PostgreSQL: a table of (id, tsvector) pairs with a GIN index, ranked with ts_rank().
+#
+# Both use the 'simple' tokenization (lower-cased words, no stemming). The index rows are rewritten from the model
+# tables by reindex(), which api/signals.py calls on every save and delete, and the bulk write paths call for the rows
+# they insert or update. Other database backends have no index: search() falls back to case-insensitive substring
+# matching there, without ranking.
+
+import re
+from django.db import connections, router
+from django.db.models import Q
+
+SEARCH_FIELDS = {
+    'library': ('description',),
+    'project': ('name', 'client_name', 'description'),
+}
+
+# relative weights of the fields above, highest first (bm25() column weights on SQLite, ts_rank() classes on
+# PostgreSQL)
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+POSTGRESQL_WEIGHTS = ('A', 'B', 'C')
+
+# records reindexed per statement, within SQLite's limit on query parameters
+REINDEX_BATCH_SIZE = 500
+
+_WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def index_table(model):
+    return '{}_search'.format(model._meta.db_table)
+
+
+def _fields(model):
+    return SEARCH_FIELDS[model._meta.model_name]
+
+
+def _qn(connection, name):
+    return connection.ops.quote_name(name)
+
+
+def _document_sql(connection, model):
+    # the tsvector of a record, with the fields weighted in order
+    return ' || '.join("setweight(to_tsvector('simple', coalesce({}, '')), '{}')".format(
+        _qn(connection, model._meta.get_field(field).column), weight)
+        for field, weight in zip(_fields(model), POSTGRESQL_WEIGHTS))
+
+
+def reindex(model, pks=None, using=None):
+    """
+    Rewrites the search index rows of the given records (or of every record) from the model table; records that do
+    not exist any more are removed from the index.
+    """
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return
+
+    table = _qn(connection, index_table(model))
+    model_table = _qn(connection, model._meta.db_table)
+    key = 'rowid' if connection.vendor == 'sqlite' else 'id'
+
+    if connection.vendor == 'sqlite':
+        columns = ', '.join(_qn(connection, model._meta.get_field(field).column) for field in _fields(model))
+        insert = 'INSERT INTO {} (rowid, {}) SELECT id, {} FROM {}'.format(table, ', '.join(_fields(model)), columns,
+                                                                          model_table)
+    else:
+        insert = 'INSERT INTO {} (id, document) SELECT id, {} FROM {}'.format(table, _document_sql(connection, model),
+                                                                             model_table)
+
+    with connection.cursor() as cursor:
+        if pks is None:
+            cursor.execute('DELETE FROM {}'.format(table))
+            cursor.execute(insert)
+            return
+
+        pks = list(pks)
+
+        for start in range(0, len(pks), REINDEX_BATCH_SIZE):
+            batch = pks[start:start + REINDEX_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute('DELETE FROM {} WHERE {} IN ({})'.format(table, key, placeholders), batch)
+            cursor.execute('{} WHERE id IN ({})'.format(insert, placeholders), batch)
+
+
+def get_words(text):
+    return _WORD_PATTERN.findall(text or '')
+
+
+def search(queryset, text):
+    """
+    Filters a queryset to the records matching every word of 'text' (the last one as a prefix, so partly typed words
+    match too) and orders them by relevance, best first.
+    """
+    words = get_words(text)
+
+    if not words:
+        return queryset.none()
+
+    model = queryset.model
+    connection = connections[queryset.db]
+    table = _qn(connection, index_table(model))
+    model_table = _qn(connection, model._meta.db_table)
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(u'"{}"'.format(word) for word in words) + '*'
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS[:len(_fields(model))])
+        # bm25() is lower for better matches
+        return queryset.extra(
+            tables=[index_table(model)],
+            where=['{}.rowid = {}.id'.format(table, model_table), '{} MATCH %s'.format(table)],
+            params=[match],
+            select={'search_rank': 'bm25({}, {})'.format(table, weights)},
+        ).order_by('search_rank', 'id')
+
+    if connection.vendor == 'postgresql':
+        query = u' & '.join(words) + ':*'
+        # ts_rank() is higher for better matches
+        return queryset.extra(
+            tables=[index_table(model)],
+            where=['{}.id = {}.id'.format(table, model_table),
+                   "{}.document @@ to_tsquery('simple', %s)".format(table)],
+            params=[query],
+            select={'search_rank': "-ts_rank({}.document, to_tsquery('simple', %s))".format(table)},
+            select_params=[query],
+        ).order_by('search_rank', 'id')
+
+    return substring_search(queryset, words)
+
+
+def substring_search(queryset, words):
+    # every word in one of the searchable fields, unranked
+    for word in words:
+        condition = Q()
+
+        for field in _fields(queryset.model):
+            condition |= Q(**{'{}__icontains'.format(field): word})
+
+        queryset = queryset.filter(condition)
+
+    return queryset.order_by('id')
@@ -1,5 +1,7 @@
 # Authored by Peter Garas for Ocom Software
 
+import json
+from collections import OrderedDict
 from django.contrib.auth.models import User
 from api.models import Library, Project, ProjectLibrary
 from rest_framework import serializers
@@ -24,7 +26,7 @@ class LibrarySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Library
-        fields = '__all__'
+        fields = ('id', 'description', 'active_start_date', 'active_end_date')
 
 
 class ProjectLibrarySerializer(serializers.HyperlinkedModelSerializer):
@@ -54,3 +56,116 @@ class ProjectSerializer(serializers.ModelSerializer):
         model = Project
         fields = ('id', 'name', 'active_start_date', 'active_end_date', 'description', 'client_name', 'git_url',
                   'testing_url', 'production_url', 'libraries')
+
+
+# Fast-path list serializers
+#
+# Read-only counterparts of LibrarySerializer and ProjectSerializer for list responses. They work on values() rows
+# instead of model instances and build the output dicts directly, skipping DRF's per-field machinery, while
+# producing exactly the same output.
+
+def _date_representation(value):
+    # same as serializers.DateField with the default ISO 8601 format
+    return value.isoformat() if value else None
+
+
+class FastLibrarySerializer(object):
+    fields = ('id', 'description', 'active_start_date', 'active_end_date')
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def get_rows(cls, queryset):
+        return queryset.values(*cls.fields)
+
+    @property
+    def data(self):
+        return [OrderedDict((
+            ('id', row['id']),
+            ('description', row['description']),
+            ('active_start_date', _date_representation(row['active_start_date'])),
+            ('active_end_date', _date_representation(row['active_end_date'])),
+        )) for row in self.rows]
+
+
+class FastProjectSerializer(object):
+    fields = ('id', 'name', 'active_start_date', 'active_end_date', 'description', 'client_name', 'git_url',
+              'testing_url', 'production_url')
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def get_rows(cls, queryset):
+        # the libraries are loaded separately (see get_libraries)
+        return queryset.prefetch_related(None).values(*cls.fields)
+
+    @classmethod
+    def get_libraries(cls, project_ids):
+        # the 'libraries' of every project (see ProjectLibrarySerializer), loaded with a single query
+        libraries = dict((project_id, []) for project_id in project_ids)
+        entries = ProjectLibrary.objects.filter(project_id__in=project_ids).order_by('id')
+
+        for project_id, entry_id, library_id, description, version in entries.values_list(
+                'project_id', 'id', 'library_id', 'library__description', 'version'):
+            libraries[project_id].append(OrderedDict((
+                ('id', entry_id),
+                ('library_id', library_id),
+                ('description', description),
+                ('version', version),
+            )))
+
+        return libraries
+
+    @property
+    def data(self):
+        rows = list(self.rows)
+        libraries = self.get_libraries([row['id'] for row in rows])
+
+        return [OrderedDict((
+            ('id', row['id']),
+            ('name', row['name']),
+            ('active_start_date', _date_representation(row['active_start_date'])),
+            ('active_end_date', _date_representation(row['active_end_date'])),
+            ('description', row['description']),
+            ('client_name', row['client_name']),
+            ('git_url', row['git_url']),
+            ('testing_url', row['testing_url']),
+            ('production_url', row['production_url']),
+            ('libraries', libraries[row['id']]),
+        )) for row in rows]
+
+
+class ProjectSummarySerializer(FastProjectSerializer):
+    """
+    The project list with the libraries of every project read from its summary (see api/summaries.py), in the same
+    query as the project itself, and their number as 'library_count'.
+    """
+
+    @classmethod
+    def get_rows(cls, queryset):
+        return queryset.prefetch_related(None).values(*cls.fields + ('summary__library_count', 'summary__libraries'))
+
+    @property
+    def data(self):
+        results = []
+
+        for row in self.rows:
+            # in their stored key order, like the libraries of FastProjectSerializer
+            libraries = json.loads(row['summary__libraries'] or '[]', object_pairs_hook=OrderedDict)
+            results.append(OrderedDict((
+                ('id', row['id']),
+                ('name', row['name']),
+                ('active_start_date', _date_representation(row['active_start_date'])),
+                ('active_end_date', _date_representation(row['active_end_date'])),
+                ('description', row['description']),
+                ('client_name', row['client_name']),
+                ('git_url', row['git_url']),
+                ('testing_url', row['testing_url']),
+                ('production_url', row['production_url']),
+                ('library_count', row['summary__library_count'] or 0),
+                ('libraries', libraries),
+            )))
+
+        return results
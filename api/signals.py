@@ -0,0 +1,107 @@
+# Authored by Peter Garas for Ocom Software
+
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from . import cache, events, models, search, summaries
+
+
+@receiver(post_save, sender=models.Library)
+@receiver(post_delete, sender=models.Library)
+@receiver(post_save, sender=models.Project)
+@receiver(post_delete, sender=models.Project)
+@receiver(post_save, sender=models.ProjectLibrary)
+@receiver(post_delete, sender=models.ProjectLibrary)
+def bump_table_version(sender, **kwargs):
+    cache.bump_version(sender._meta.model_name)
+
+
+@receiver(post_save, sender=models.Library)
+@receiver(post_delete, sender=models.Library)
+@receiver(post_save, sender=models.Project)
+@receiver(post_delete, sender=models.Project)
+def update_search_index(sender, instance, **kwargs):
+    search.reindex(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=models.Library)
+@receiver(post_delete, sender=models.Project)
+@receiver(post_delete, sender=models.ProjectLibrary)
+def record_tombstone(sender, instance, **kwargs):
+    models.Tombstone.objects.create(model_name=sender._meta.model_name, object_id=instance.pk)
+
+
+@receiver(post_save, sender=models.ProjectLibrary)
+@receiver(post_delete, sender=models.ProjectLibrary)
+def touch_project(sender, instance, **kwargs):
+    # a project's library entries are part of the project as clients see it
+    models.Project.objects.filter(pk=instance.project_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=models.Project)
+def create_summary(sender, instance, created, **kwargs):
+    if created:
+        summaries.rebuild([instance.pk])
+
+
+@receiver(post_delete, sender=models.Project)
+def delete_summary(sender, instance, **kwargs):
+    models.ProjectSummary.objects.filter(project_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=models.ProjectLibrary)
+@receiver(post_delete, sender=models.ProjectLibrary)
+def update_summary(sender, instance, **kwargs):
+    summaries.rebuild([instance.project_id])
+
+
+@receiver(post_save, sender=models.Library)
+def update_library_summaries(sender, instance, created, update_fields=None, **kwargs):
+    # the summaries only hold the description of a library; new libraries are not used by any project yet
+    if update_fields is not None and 'description' not in update_fields:
+        return
+
+    if not created and instance.description != instance._loaded_description:
+        summaries.rebuild_for_libraries([instance.pk])
+
+    instance._loaded_description = instance.description
+
+
+@receiver(post_save, sender=models.Library)
+@receiver(post_save, sender=models.Project)
+@receiver(post_save, sender=models.ProjectLibrary)
+def publish_save(sender, instance, **kwargs):
+    events.publish(sender._meta.model_name, 'saved', [instance.pk])
+
+
+@receiver(post_delete, sender=models.Library)
+@receiver(post_delete, sender=models.Project)
+@receiver(post_delete, sender=models.ProjectLibrary)
+def publish_delete(sender, instance, **kwargs):
+    events.publish(sender._meta.model_name, 'deleted', [instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def bump_user_groups_version(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        cache.bump_version('user_groups:{}'.format(instance.pk))
+    elif pk_set:
+        cache.bump_version(*['user_groups:{}'.format(pk) for pk in pk_set])
+    else:
+        # a group was cleared of all of its users, who are not known any more
+        cache.bump_version('group_permissions')
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def bump_group_permissions_version(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        cache.bump_version('group_permissions')
+
+
+@receiver(post_delete, sender=Group)
+def bump_group_permissions_version_on_delete(sender, **kwargs):
+    cache.bump_version('group_permissions')
@@ -0,0 +1,65 @@
+# Authored by Peter Garas for Ocom Software
+
+# Project summaries
+#
+# The project list needs the library entries of every project, each joined with its library. ProjectSummary keeps
+# them precomputed per project, as the JSON of the project's 'libraries' (see ProjectSummarySerializer), so the list
+# can be read from the project and summary tables alone ("GET /api/projects/?view=summary").
+#
+# A summary is rebuilt from the entries whenever they change: api/signals.py calls rebuild() for the project of a
+# saved or deleted entry, and rebuild_for_libraries() for the projects using a saved library, and the bulk write paths
+# call them for the rows they write. Rebuilding a project's summary takes the same few queries however the entries
+# changed. Summaries are updated in place (and only created when missing), so concurrent rebuilds of the same project
+# never both insert its row.
+
+import json
+from django.db import IntegrityError, transaction
+from . import models, serializers
+
+# projects rebuilt per batch, within SQLite's limit on query parameters
+BATCH_SIZE = 500
+
+
+def rebuild(project_ids):
+    """
+    Rewrites the summaries of the given projects from their library entries; projects that do not exist any more get
+    none.
+    """
+    project_ids = list(set(project_ids))
+
+    for start in range(0, len(project_ids), BATCH_SIZE):
+        batch = project_ids[start:start + BATCH_SIZE]
+        existing = list(models.Project.objects.filter(pk__in=batch).values_list('id', flat=True))
+        libraries = serializers.FastProjectSerializer.get_libraries(existing)
+        models.ProjectSummary.objects.filter(project_id__in=set(batch) - set(existing)).delete()
+
+        for project_id, entries in libraries.items():
+            _save(project_id, library_count=len(entries), libraries=json.dumps(entries, separators=(',', ':')))
+
+
+def _save(project_id, **values):
+    summaries = models.ProjectSummary.objects.filter(project_id=project_id)
+
+    if summaries.update(**values):
+        return
+
+    try:
+        with transaction.atomic():
+            models.ProjectSummary.objects.create(project_id=project_id, **values)
+    except IntegrityError:
+        # created meanwhile by a concurrent rebuild
+        summaries.update(**values)
+
+
+def rebuild_for_libraries(library_ids):
+    """
+    Rewrites the summaries of the projects using the given libraries, e.g. after their descriptions changed.
+    """
+    library_ids = list(library_ids)
+    project_ids = set()
+
+    for start in range(0, len(library_ids), BATCH_SIZE):
+        project_ids.update(models.ProjectLibrary.objects.filter(library_id__in=library_ids[start:start + BATCH_SIZE])
+                           .values_list('project_id', flat=True))
+
+    rebuild(project_ids)
@@ -0,0 +1,99 @@
+# Authored by Peter Garas for Ocom Software
+
+# Delta sync
+#
+# Clients keep a copy of the libraries and projects up to date by asking for the changes since an opaque change token
+# (see SyncViewSet). A token stands for a point in time: the rows whose updated_at is later, and the tombstones of the
+# rows deleted since, are the changes after it.
+#
+# A transaction may commit some time after it set updated_at, so a token points API_SYNC_WINDOW_SECONDS before the
+# request that returned it: consecutive responses overlap by that window instead of missing rows committed late.
+# Applying the same change twice is harmless, as every change holds the whole row (or is a deletion).
+
+import base64
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from . import models, serializers
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+CHUNK_SIZE = 500
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(ValueError):
+    pass
+
+
+def get_retention():
+    return timedelta(days=getattr(settings, 'API_SYNC_RETENTION_DAYS', 30))
+
+
+def encode_token(moment):
+    microseconds = int((moment - _EPOCH).total_seconds() * 1000000)
+    return base64.urlsafe_b64encode(str(microseconds).encode('ascii')).decode('ascii')
+
+
+def decode_token(token):
+    try:
+        microseconds = int(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidToken("Invalid token")
+
+    moment = _EPOCH + timedelta(microseconds=microseconds)
+
+    if moment < timezone.now() - get_retention():
+        # the tombstones of deletions since then may be gone
+        raise ExpiredToken("Expired token: load the lists again and start over with a new token")
+
+    return moment
+
+
+def get_token():
+    """
+    Returns the token to use for the next sync.
+    """
+    return encode_token(timezone.now() - timedelta(seconds=getattr(settings, 'API_SYNC_WINDOW_SECONDS', 5)))
+
+
+def get_changes(since):
+    """
+    Returns the libraries and projects (serialized like in the API lists) changed after 'since', and the ids of the
+    libraries, projects and project library entries deleted since then.
+    """
+    token = get_token()
+    libraries = serializers.FastLibrarySerializer(serializers.FastLibrarySerializer.get_rows(
+        models.Library.objects.filter(updated_at__gt=since).order_by('id'))).data
+
+    # the projects that changed themselves (including their library entries), and the projects using a library that
+    # changed, as the library descriptions are part of them
+    library_projects = models.ProjectLibrary.objects.filter(library__updated_at__gt=since).values('project_id')
+    rows = list(serializers.FastProjectSerializer.get_rows(models.Project.objects.filter(
+        Q(updated_at__gt=since) | Q(id__in=library_projects)).order_by('id')))
+    projects = []
+
+    # serialized in chunks, which bounds the number of ids in each library entries query
+    for start in range(0, len(rows), CHUNK_SIZE):
+        projects += serializers.FastProjectSerializer(rows[start:start + CHUNK_SIZE]).data
+
+    deleted = dict((name, []) for name in ('library', 'project', 'projectlibrary'))
+
+    for model_name, object_id in models.Tombstone.objects.filter(deleted_at__gt=since).order_by('id').values_list(
+            'model_name', 'object_id'):
+        deleted[model_name].append(object_id)
+
+    return {
+        'token': token,
+        'libraries': libraries,
+        'projects': projects,
+        'deleted': {
+            'libraries': deleted['library'],
+            'projects': deleted['project'],
+            'project_libraries': deleted['projectlibrary'],
+        },
+    }
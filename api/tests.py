@@ -1,3 +1,1318 @@
-from django.test import TestCase
+# Authored by Peter Garas for Ocom Software
 
-# Create your tests here.
+import json
+import pkgutil
+import threading
+import time
+from base64 import b64encode
+from contextlib import contextmanager
+from datetime import date, timedelta
+from unittest import skipUnless
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache as django_cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from config import replicas
+from . import (cache, events, models, offload, pagination, serializers, summaries, sync, utils, validation, versions,
+               viewsets)
+
+
+@contextmanager
+def frozen_today(day):
+    # date.today() returns 'day' in the modules that filter or cache by the current date
+    class FrozenDate(date):
+        @classmethod
+        def today(cls):
+            return day
+
+    saved = models.date, cache.date
+    models.date = cache.date = FrozenDate
+
+    try:
+        yield
+    finally:
+        models.date, cache.date = saved
+
+
+def assert_fixed_query_count(test, request, small, large):
+    # request(size) makes a request on 'size' items, which must succeed, with as many queries for 'large' items as for
+    # 'small' ones; a first request fills the caches (e.g. of the project privileges) beforehand
+    def count_queries(size):
+        with CaptureQueriesContext(connection) as context:
+            test.assertEqual(request(size).status_code, 200)
+
+        return len(context.captured_queries)
+
+    request(small)
+    test.assertEqual(count_queries(small), count_queries(large))
+
+
+def create_library(description='Library', active_start_date=date(2017, 1, 1), active_end_date=None):
+    return models.Library.objects.create(description=description, active_start_date=active_start_date,
+                                         active_end_date=active_end_date)
+
+
+def create_project(name='Project', libraries=()):
+    project = models.Project.objects.create(name=name, active_start_date=date(2017, 1, 1), client_name='Client',
+                                            git_url='https://example.com/project.git')
+
+    for library, version in libraries:
+        models.ProjectLibrary.objects.create(project=project, library=library, version=version)
+
+    return project
+
+
+def create_project_user(username='projects'):
+    # a user with the project privileges (see README.md)
+    group, _ = Group.objects.get_or_create(name='project access')
+    group.permissions.add(*Permission.objects.filter(content_type__app_label='api',
+                                                     codename__in=['add_project', 'change_project', 'delete_project']))
+    user = User.objects.create_user(username, password='testing123')
+    user.groups.add(group)
+    return user
+
+
+class ProjectListTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.libraries = [create_library('Library {}'.format(i)) for i in range(3)]
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/projects/')
+
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.data['results']
+
+    def test_list_includes_nested_libraries(self):
+        create_project('Alpha', [(self.libraries[0], '1.0'), (self.libraries[1], '2.0')])
+        _, data = self._count_list_queries()
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual([(lib['library_id'], lib['description'], lib['version']) for lib in data[0]['libraries']],
+                         [(self.libraries[0].id, 'Library 0', '1.0'), (self.libraries[1].id, 'Library 1', '2.0')])
+
+    def test_list_query_count_is_flat(self):
+        create_project('Alpha', [(self.libraries[0], '1.0')])
+        single_count, _ = self._count_list_queries()
+
+        for i in range(20):
+            create_project('Project {}'.format(i), [(library, '1.{}'.format(i)) for library in self.libraries])
+        many_count, data = self._count_list_queries()
+
+        self.assertEqual(len(data), 21)
+        self.assertEqual(single_count, many_count)
+
+
+class LibraryListFilterTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        today = date.today()
+        self.active = create_library('Active', date(2000, 1, 1))
+        self.expired = create_library('Expired', date(2000, 1, 1), date(2001, 1, 1))
+        self.future = create_library('Future', date(today.year + 10, 1, 1))
+        self.bounded = create_library('Bounded', date(2000, 1, 1), date(today.year + 10, 1, 1))
+
+    def _list_ids(self, params=None):
+        response = self.client.get('/api/libraries/', params or {})
+        self.assertEqual(response.status_code, 200)
+        return [library['id'] for library in response.data['results']]
+
+    def test_active_and_inactive_partition_all(self):
+        self.assertEqual(self._list_ids(), [self.active.id, self.expired.id, self.future.id, self.bounded.id])
+        self.assertEqual(self._list_ids({'active': 'true'}), [self.active.id, self.bounded.id])
+        self.assertEqual(self._list_ids({'active': 'false'}), [self.expired.id, self.future.id])
+
+    def test_inactive_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/libraries/', {'active': 'false'})
+
+    def test_active_on(self):
+        self.assertEqual(self._list_ids({'active_on': '2000-06-01'}),
+                         [self.active.id, self.expired.id, self.bounded.id])
+
+    def test_active_between(self):
+        self.assertEqual(self._list_ids({'active_between': '2002-01-01,2003-01-01'}),
+                         [self.active.id, self.bounded.id])
+        self.assertEqual(self._list_ids({'active_between': '1990-01-01,2000-01-01'}),
+                         [self.active.id, self.expired.id, self.bounded.id])
+
+    def test_invalid_date_filters(self):
+        for params in ({'active_on': '2000-13-01'}, {'active_between': '2000-01-01'},
+                       {'active_between': '2001-01-01,2000-01-01'}):
+            response = self.client.get('/api/libraries/', params)
+            self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.libraries = [create_library('Library {}'.format(i)) for i in range(5)]
+
+    def _collect_pages(self, url, params):
+        ids = []
+        pages = 0
+
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            url, params = response.data['next'], None
+            pages += 1
+
+        return ids, pages
+
+    def test_pages_cover_all_rows_in_order(self):
+        ids, pages = self._collect_pages('/api/libraries/', {'page_size': 2})
+
+        self.assertEqual(ids, [library.id for library in self.libraries])
+        self.assertEqual(pages, 3)
+
+    def test_insert_while_paging_does_not_shift_pages(self):
+        response = self.client.get('/api/libraries/', {'page_size': 2})
+        create_library('Late')
+        models.Library.objects.filter(pk=self.libraries[0].pk).delete()
+        ids, _ = self._collect_pages(response.data['next'], None)
+
+        self.assertEqual(ids[:3], [library.id for library in self.libraries[2:]])
+        self.assertEqual(len(ids), 4)
+
+    def test_page_size_is_capped(self):
+        with self.settings(API_MAX_PAGE_SIZE=3):
+            response = self.client.get('/api/libraries/', {'page_size': 50})
+
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_project_pages(self):
+        projects = [create_project('Project {}'.format(i)) for i in range(3)]
+        ids, pages = self._collect_pages('/api/projects/', {'page_size': 2})
+
+        self.assertEqual(ids, [project.id for project in projects])
+        self.assertEqual(pages, 2)
+
+
+class ProjectLibraryWriteTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_project_user())
+        self.libraries = [create_library('Library {}'.format(i)) for i in range(3)]
+        self.project = create_project('Alpha', [(self.libraries[0], '1.0'), (self.libraries[1], '1.0')])
+        self.entries = list(self.project.projectlibrary_set.order_by('id'))
+
+    def _edit(self, libraries):
+        return self.client.put('/api/projects/edit/', {'id': self.project.id, 'name': 'Alpha',
+                                                       'active_start_date': '2017-01-01', 'client_name': 'Client',
+                                                       'git_url': 'https://example.com/project.git',
+                                                       'libraries': libraries}, format='json')
+
+    def _versions(self):
+        return sorted(self.project.projectlibrary_set.values_list('library_id', 'version'))
+
+    def test_remove_insert_and_update(self):
+        libraries = [{'id': self.entries[0].id, 'version': '1.0', 'remove': True},
+                     {'id': self.entries[1].id, 'version': '2.0'}]
+        libraries += [{'id': library.id, 'version': '3.0', 'new': 'true'} for library in self.libraries]
+        response = self._edit(libraries)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._versions(), [(self.libraries[0].id, '3.0'), (self.libraries[1].id, '2.0'),
+                                            (self.libraries[1].id, '3.0'), (self.libraries[2].id, '3.0')])
+
+    def test_statement_count_is_fixed(self):
+        def edit(size):
+            return self._edit([{'id': self.libraries[i % 3].id, 'version': str(i), 'new': True}
+                               for i in range(size)])
+
+        assert_fixed_query_count(self, edit, 1, 50)
+
+    def test_invalid_entry_saves_nothing(self):
+        libraries = [{'id': self.entries[0].id, 'version': '1.0', 'remove': True},
+                     {'id': self.libraries[2].id, 'version': '3.0', 'new': True},
+                     {'id': 0, 'version': '4.0', 'new': True}]
+        response = self._edit(libraries)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._versions(), [(self.libraries[0].id, '1.0'), (self.libraries[1].id, '1.0')])
+
+    def test_non_numeric_ids_are_rejected(self):
+        for entry in ({'id': 'abc', 'version': '3.0', 'new': True}, {'id': 'abc', 'version': '3.0'},
+                      {'id': 'abc', 'remove': True}, {'id': [self.entries[0].id], 'version': '3.0'}):
+            response = self._edit([entry])
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, viewsets.ProjectViewSet.invalid_library_request)
+
+        self.assertEqual(self._versions(), [(self.libraries[0].id, '1.0'), (self.libraries[1].id, '1.0')])
+
+    def test_numeric_string_ids_are_the_same_entry(self):
+        response = self._edit([{'id': str(self.entries[0].id), 'version': '2.0'},
+                               {'id': self.entries[0].id, 'version': '2.0'},
+                               {'id': str(self.libraries[2].id), 'version': '3.0', 'new': True}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._versions(), [(self.libraries[0].id, '2.0'), (self.libraries[1].id, '1.0'),
+                                            (self.libraries[2].id, '3.0')])
+
+    def test_repeated_inserts_are_ignored(self):
+        libraries = [{'id': self.libraries[2].id, 'version': '3.0', 'new': True},
+                     {'id': self.libraries[2].id, 'version': '3.0', 'new': True},
+                     {'id': self.libraries[0].id, 'version': '1.0', 'new': True}]
+
+        for _ in range(2):
+            self.assertEqual(self._edit(libraries).status_code, 200)
+
+        self.assertEqual(self._versions(), [(self.libraries[0].id, '1.0'), (self.libraries[1].id, '1.0'),
+                                            (self.libraries[2].id, '3.0')])
+
+    def test_update_to_an_existing_version_is_rejected(self):
+        self._edit([{'id': self.libraries[0].id, 'version': '2.0', 'new': True}])
+        response = self._edit([{'id': self.entries[0].id, 'version': '2.0'}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._versions(), [(self.libraries[0].id, '1.0'), (self.libraries[0].id, '2.0'),
+                                            (self.libraries[1].id, '1.0')])
+
+    def test_update_of_another_projects_entry_is_rejected(self):
+        other = create_project('Beta', [(self.libraries[2], '1.0')])
+        response = self._edit([{'id': other.projectlibrary_set.get().id, 'version': '9.9'}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(other.projectlibrary_set.get().version, '1.0')
+
+    def test_insert_ignore_fallback_skips_conflicts(self):
+        # the per-row inserts used on databases without an "insert or ignore"
+        inserted = utils._insert_each_ignoring_conflicts(models.ProjectLibrary, [
+            models.ProjectLibrary(project=self.project, library=self.libraries[0], version='1.0'),
+            models.ProjectLibrary(project=self.project, library=self.libraries[2], version='1.0'),
+            models.ProjectLibrary(project=self.project, library=self.libraries[2], version='1.0')], 'default')
+
+        self.assertEqual(inserted, 1)
+        self.assertEqual(self._versions(), [(self.libraries[0].id, '1.0'), (self.libraries[1].id, '1.0'),
+                                            (self.libraries[2].id, '1.0')])
+
+    def test_create_is_atomic(self):
+        response = self.client.post('/api/projects/', {'name': 'Gamma', 'active_start_date': '2017-01-01',
+                                                       'client_name': 'Client',
+                                                       'git_url': 'https://example.com/gamma.git',
+                                                       'libraries': [{'id': 0, 'version': '1.0', 'new': True}]},
+                                    format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.Project.objects.filter(name='Gamma').exists())
+
+
+class LibraryBulkTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.libraries = [create_library('Library {}'.format(i)) for i in range(3)]
+
+    def _bulk(self, operations):
+        return self.client.post('/api/libraries/bulk/', operations, format='json')
+
+    def test_create_update_and_delete(self):
+        response = self._bulk([{'action': 'create', 'description': 'New', 'active_start_date': '2017-02-01'},
+                               {'action': 'update', 'id': self.libraries[0].id, 'description': 'Renamed',
+                                'active_start_date': '2017-03-01', 'active_end_date': '2017-04-01'},
+                               {'action': 'delete', 'id': self.libraries[1].id}])
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'updated', 'deleted'])
+        self.assertEqual(models.Library.objects.get(pk=results[0]['id']).description, 'New')
+        library = models.Library.objects.get(pk=self.libraries[0].id)
+        self.assertEqual((library.description, library.active_end_date), ('Renamed', date(2017, 4, 1)))
+        self.assertFalse(models.Library.objects.filter(pk=self.libraries[1].id).exists())
+
+    def test_invalid_operation_saves_nothing(self):
+        response = self._bulk([{'action': 'create', 'description': 'New', 'active_start_date': '2017-02-01'},
+                               {'action': 'delete', 'id': self.libraries[1].id},
+                               {'action': 'update', 'id': 0, 'description': 'Missing',
+                                'active_start_date': '2017-03-01'},
+                               {'action': 'create', 'description': 'Bad', 'active_start_date': 'yesterday'}])
+
+        self.assertEqual(response.status_code, 400)
+        errors = [bool(result['errors']) for result in response.data['results']]
+        self.assertEqual(errors, [False, False, True, True])
+        self.assertEqual(models.Library.objects.count(), 3)
+
+    def test_statement_count_is_fixed(self):
+        def bulk(size):
+            operations = [{'action': 'create', 'description': str(i), 'active_start_date': '2017-01-01'}
+                          for i in range(size)]
+            operations += [{'action': 'update', 'id': library.id, 'description': 'Updated',
+                            'active_start_date': '2017-01-01'} for library in self.libraries[:size]]
+            return self._bulk(operations)
+
+        assert_fixed_query_count(self, bulk, 1, 3)
+
+
+class ProjectImportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_project_user())
+        self.libraries = [create_library('Library {}'.format(i)) for i in range(2)]
+
+    def _import(self, name, content, **params):
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post('/api/projects/import/', {'file': upload}, format='multipart', **params)
+
+    def _entries(self, name):
+        return sorted(models.ProjectLibrary.objects.filter(project__name=name).values_list('library_id', 'version'))
+
+    def test_csv(self):
+        content = ('name,active_start_date,active_end_date,client_name,git_url,libraries\n'
+                   'Alpha,2017-01-01,,Client,https://example.com/alpha.git,Library 0=1.0;{}=2.0\n'
+                   'Beta,2017-01-01,2017-02-01,Client,https://example.com/beta.git,\n').format(self.libraries[1].id)
+        response = self._import('projects.csv', content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['imported'], response.data['failed']), (2, 0))
+        self.assertEqual(self._entries('Alpha'), [(self.libraries[0].id, '1.0'), (self.libraries[1].id, '2.0')])
+        self.assertEqual(models.Project.objects.get(name='Beta').active_end_date, date(2017, 2, 1))
+
+    def test_invalid_rows_are_skipped(self):
+        rows = [{'name': 'Alpha', 'active_start_date': '2017-01-01', 'client_name': 'Client',
+                 'git_url': 'https://example.com/alpha.git', 'libraries': [{'library_id': self.libraries[0].id,
+                                                                            'version': '1.0'}]},
+                {'name': 'Beta', 'active_start_date': 'yesterday', 'client_name': 'Client',
+                 'git_url': 'https://example.com/beta.git'},
+                {'name': 'Gamma', 'active_start_date': '2017-01-01', 'client_name': 'Client',
+                 'git_url': 'https://example.com/gamma.git', 'libraries': [{'library': 'Missing', 'version': '1.0'}]}]
+        content = '\n'.join(json.dumps(row) for row in rows) + '\nnot json\n'
+        response = self._import('projects.ndjson', content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['imported'], response.data['failed']), (1, 3))
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3, 4])
+        self.assertEqual(list(models.Project.objects.values_list('name', flat=True)), ['Alpha'])
+        self.assertEqual(self._entries('Alpha'), [(self.libraries[0].id, '1.0')])
+
+    def test_export_round_trip(self):
+        create_project('Alpha', [(self.libraries[0], '1.0'), (self.libraries[1], '2.0')])
+        export = b''.join(self.client.get('/api/projects/export/?output=ndjson').streaming_content)
+        response = self._import('export', export, QUERY_STRING='input=ndjson')
+
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(self._entries('Alpha'), [(self.libraries[0].id, '1.0'), (self.libraries[0].id, '1.0'),
+                                                  (self.libraries[1].id, '2.0'), (self.libraries[1].id, '2.0')])
+
+
+class DateValidationTest(TestCase):
+    def test_parse_iso_date(self):
+        self.assertEqual(validation.parse_iso_date('2017-01-31'), date(2017, 1, 31))
+        self.assertEqual(validation.parse_iso_date('2017-1-5'), date(2017, 1, 5))
+
+        for date_text in ('2017-02-30', '2017-13-01', '17-01-01', '2017-01-01x', '2017-01-01\n', '', None, 20170101):
+            self.assertIsNone(validation.parse_iso_date(date_text))
+
+    def test_batch_errors_per_record(self):
+        errors = validation.validate_date_records([
+            {'active_start_date': '2017-01-01', 'active_end_date': None},
+            {'active_start_date': '2017-01-01', 'active_end_date': 'never'},
+            {'active_start_date': '2017-02-01', 'active_end_date': '2017-01-01'},
+            {'active_start_date': '2017-01-01', 'active_end_date': '2017-01-01'},
+        ])
+
+        self.assertEqual([bool(record_errors) for record_errors in errors], [False, True, True, False])
+        self.assertIn('active_end_date', errors[1]['detail'])
+
+    def test_end_before_start_is_rejected(self):
+        response = APIClient().post('/api/libraries/', {'description': 'Library', 'active_start_date': '2017-02-01',
+                                                        'active_end_date': '2017-01-01'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.Library.objects.exists())
+
+    def test_project_edit_checks_dates(self):
+        client = APIClient()
+        client.force_authenticate(create_project_user())
+        project = create_project()
+        data = {'id': project.id, 'name': 'Project', 'client_name': 'Client', 'git_url': 'https://example.com/p.git'}
+
+        response = client.put('/api/projects/edit/', dict(data, active_start_date='2017-02-01',
+                                                           active_end_date='2017-01-01'), format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # serializer errors are reported too
+        response = client.put('/api/projects/edit/', dict(data, active_start_date='2017-01-01', git_url='not a url'),
+                              format='json')
+        self.assertEqual(response.status_code, 400)
+        response = client.put('/api/projects/edit/', dict(data, active_start_date='2017-01-01\n'), format='json')
+        self.assertEqual(response.status_code, 400)
+        project.refresh_from_db()
+        self.assertEqual((project.active_end_date, project.git_url), (None, 'https://example.com/project.git'))
+
+
+class LibraryProjectsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.library = create_library()
+        self.projects = [create_project('Project {}'.format(i), [(self.library, '1.{}'.format(i % 3))])
+                         for i in range(6)]
+
+    def test_grouped_by_version(self):
+        response = self.client.get('/api/libraries/{}/projects/'.format(self.library.id))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(group['version'], group['count']) for group in response.data['results']],
+                         [('1.0', 2), ('1.1', 2), ('1.2', 2)])
+        self.assertEqual(response.data['results'][0]['project_ids'], [self.projects[0].id, self.projects[3].id])
+
+    def test_pages(self):
+        versions = []
+        url = '/api/libraries/{}/projects/?page_size=2'.format(self.library.id)
+
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+
+            self.assertEqual(len(context.captured_queries), 2)  # the library and the page of versions
+            versions += [group['version'] for group in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(versions, ['1.0', '1.1', '1.2'])
+
+    def test_pages_in_version_order(self):
+        other = create_library('Other')
+        create_project('Alpha', [(other, version) for version in ('10.0.0', 'latest', '9.0.0', 'v1.2', '1.2', 'dev')])
+        versions = []
+        url = '/api/libraries/{}/projects/?page_size=2'.format(other.id)
+
+        while url:
+            response = self.client.get(url)
+            versions += [group['version'] for group in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(versions, ['1.2', 'v1.2', '9.0.0', '10.0.0', 'dev', 'latest'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('not base64', b64encode(b'"1.0"'), b64encode(b'[1, "1.0"]')):
+            response = self.client.get('/api/libraries/{}/projects/'.format(self.library.id), {'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+    def test_unknown_library(self):
+        self.assertEqual(self.client.get('/api/libraries/0/projects/').status_code, 404)
+
+    def test_uses_index(self):
+        entries = models.ProjectLibrary.objects.filter(library=self.library)
+        next_versions = pagination.VersionGroupPagination()._next_versions(entries, 2, (versions.version_key('1.0'),
+                                                                                        '1.0'))
+        sql, params = entries.filter(next_versions).values_list('version_key', 'version', 'project_id') \
+            .query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+
+        self.assertIn('COVERING INDEX', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class VersionRangeTest(TestCase):
+    versions = ['0.9', '1.0.0-alpha', '1.0.0-alpha.2', '1.0.0-alpha.10', '1.0.0-beta', '1.0.0', 'v1.2', '1.2.3',
+                '1.10.0', '2.0.0-rc.1', '2.0.0', '2.3.1', 'latest']
+
+    def setUp(self):
+        self.library = create_library()
+        create_project('Alpha', [(self.library, version) for version in self.versions])
+
+    def _matching(self, version_range):
+        response = APIClient().get('/api/project_libraries/', {'library': self.library.id, 'version': version_range})
+        self.assertEqual(response.status_code, 200)
+        return sorted(entry['version'] for entry in response.data)
+
+    def test_keys_sort_in_version_order(self):
+        keys = [versions.version_key(version) for version in self.versions[:-1]]
+
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(versions.version_key('1.2'), versions.version_key('1.2.0'))
+        self.assertIsNone(versions.version_key('latest'))
+
+    def test_ranges(self):
+        self.assertEqual(self._matching('<1.0.0'), sorted(['0.9', '1.0.0-alpha', '1.0.0-alpha.2', '1.0.0-alpha.10',
+                                                            '1.0.0-beta']))
+        self.assertEqual(self._matching('>=1.2 <2.0.0'), sorted(['v1.2', '1.2.3', '1.10.0', '2.0.0-rc.1']))
+        self.assertEqual(self._matching('^1.2.0'), sorted(['v1.2', '1.2.3', '1.10.0']))
+        self.assertEqual(self._matching('~1.2 || 2.x'), sorted(['v1.2', '1.2.3', '2.0.0-rc.1', '2.0.0', '2.3.1']))
+        self.assertEqual(self._matching('1.2.3 - 2.0'), sorted(['1.2.3', '1.10.0', '2.0.0-rc.1', '2.0.0']))
+        self.assertEqual(self._matching('>2.0'), ['2.3.1'])
+        self.assertEqual(self._matching('=1.2.3'), ['1.2.3'])
+
+    def test_invalid_range(self):
+        response = APIClient().get('/api/project_libraries/', {'version': '>=one'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_key_follows_edits(self):
+        client = APIClient()
+        client.force_authenticate(create_project_user())
+        entry = models.ProjectLibrary.objects.get(version='0.9')
+        project = entry.project
+        client.put('/api/projects/edit/', {'id': project.id, 'name': project.name, 'active_start_date': '2017-01-01',
+                                           'client_name': project.client_name, 'git_url': project.git_url,
+                                           'libraries': [{'id': entry.id, 'version': '3.0'}]}, format='json')
+
+        self.assertEqual(models.ProjectLibrary.objects.get(pk=entry.id).version_key, versions.version_key('3.0'))
+
+    def test_range_uses_index(self):
+        entries = models.ProjectLibrary.objects.filter(versions.parse_range('>=1.2 <2.0.0'), library=self.library)
+        sql, params = entries.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+
+        self.assertIn('version_key', plan)
+        self.assertIn('SEARCH', plan)
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.django = create_library('Django web framework')
+        self.requests = create_library('Requests HTTP library')
+        self.alpha = create_project('Payments', [(self.django, '1.10')])
+        self.beta = create_project('Website')
+        self.beta.description = 'Payments page of the client website'
+        self.beta.save()
+
+    def _search(self, url, text):
+        response = self.client.get(url, {'q': text})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_library_search(self):
+        self.assertEqual(self._search('/api/libraries/', 'web'), [self.django.id])
+        self.assertEqual(self._search('/api/libraries/', 'http lib'), [self.requests.id])
+        self.assertEqual(self._search('/api/libraries/', 'http django'), [])
+
+    def test_ranked_by_field_weight(self):
+        # a name match ranks above a description match
+        self.assertEqual(self._search('/api/projects/', 'payments'), [self.alpha.id, self.beta.id])
+
+    def test_index_follows_changes(self):
+        self.django.description = 'Flask'
+        self.django.save()
+        self.requests.delete()
+
+        self.assertEqual(self._search('/api/libraries/', 'django'), [])
+        self.assertEqual(self._search('/api/libraries/', 'requests'), [])
+        self.assertEqual(self._search('/api/libraries/', 'flask'), [self.django.id])
+
+    def test_bulk_writes_are_indexed(self):
+        self.client.post('/api/libraries/bulk/', [{'action': 'create', 'description': 'Celery task queue',
+                                                   'active_start_date': '2017-01-01'},
+                                                  {'action': 'update', 'id': self.django.id,
+                                                   'description': 'Django', 'active_start_date': '2017-01-01'}],
+                         format='json')
+
+        self.assertEqual(len(self._search('/api/libraries/', 'celery')), 1)
+        self.assertEqual(self._search('/api/libraries/', 'framework'), [])
+
+    def test_search_syntax_is_not_interpreted(self):
+        self.assertEqual(self._search('/api/libraries/', '"web*(:'), [self.django.id])
+        self.assertEqual(self._search('/api/libraries/', '"!'), [])
+
+
+@override_settings(API_SYNC_WINDOW_SECONDS=0)
+class SyncTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.libraries = [create_library('Library {}'.format(i)) for i in range(2)]
+        self.projects = [create_project('Project {}'.format(i), [(self.libraries[i], '1.0')]) for i in range(2)]
+        self.token = self.client.get('/api/sync/').data['token']
+
+    def _changes(self):
+        response = self.client.get('/api/sync/', {'since': self.token})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_no_changes(self):
+        changes = self._changes()
+
+        self.assertEqual((changes['libraries'], changes['projects']), ([], []))
+        self.assertEqual(changes['deleted'], {'libraries': [], 'projects': [], 'project_libraries': []})
+
+    def test_changed_and_deleted_rows(self):
+        self.projects[0].name = 'Renamed'
+        self.projects[0].save()
+        entry = self.projects[1].projectlibrary_set.get()
+        entry_id = entry.id
+        entry.delete()
+        new_library = create_library('New')
+        changes = self._changes()
+
+        self.assertEqual([library['id'] for library in changes['libraries']], [new_library.id])
+        self.assertEqual([(project['id'], project['name'], len(project['libraries'])) for project in
+                          changes['projects']], [(self.projects[0].id, 'Renamed', 1), (self.projects[1].id,
+                                                                                       'Project 1', 0)])
+        self.assertEqual(changes['deleted']['project_libraries'], [entry_id])
+
+    def test_library_change_includes_projects_using_it(self):
+        self.libraries[1].description = 'Renamed'
+        self.libraries[1].save()
+        changes = self._changes()
+
+        self.assertEqual([project['id'] for project in changes['projects']], [self.projects[1].id])
+        self.assertEqual(changes['projects'][0]['libraries'][0]['description'], 'Renamed')
+
+    def test_project_delete_leaves_tombstones(self):
+        project_id, entry_id = self.projects[0].id, self.projects[0].projectlibrary_set.get().id
+        self.projects[0].delete()
+
+        self.assertEqual(self._changes()['deleted'], {'libraries': [], 'projects': [project_id],
+                                                      'project_libraries': [entry_id]})
+
+    def test_invalid_and_expired_tokens(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': '!'}).status_code, 400)
+        expired = sync.encode_token(timezone.now() - sync.get_retention() - timedelta(days=1))
+        self.assertEqual(self.client.get('/api/sync/', {'since': expired}).status_code, 410)
+
+
+class ProjectSummaryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_project_user())
+        self.libraries = [create_library('Library {}'.format(i)) for i in range(2)]
+        self.projects = [create_project('Alpha', [(self.libraries[0], '1.0'), (self.libraries[1], '2.0')]),
+                         create_project('Beta')]
+
+    def _summary_list(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/projects/', {'view': 'summary'})
+
+        self.assertEqual(response.status_code, 200)
+        # read without the library tables
+        self.assertFalse([query for query in context.captured_queries if 'api_projectlibrary' in query['sql']
+                          or 'api_library' in query['sql']])
+        return response.data['results']
+
+    def _assert_matches_list(self):
+        full = self.client.get('/api/projects/').data['results']
+        summary = self._summary_list()
+
+        self.assertEqual([project.pop('library_count') for project in summary],
+                         [len(project['libraries']) for project in full])
+        # the same JSON, key order included
+        self.assertEqual(json.dumps(summary), json.dumps(full))
+
+    def test_matches_list(self):
+        self._assert_matches_list()
+
+    def test_matches_fast_serializer(self):
+        projects = models.Project.objects.order_by('id')
+        summary = serializers.ProjectSummarySerializer(serializers.ProjectSummarySerializer.get_rows(projects)).data
+        fast = serializers.FastProjectSerializer(serializers.FastProjectSerializer.get_rows(projects)).data
+
+        self.assertEqual([project.pop('library_count') for project in summary], [2, 0])
+        self.assertEqual(json.dumps(summary), json.dumps(fast))
+
+    def test_follows_changes(self):
+        entries = list(self.projects[0].projectlibrary_set.order_by('id'))
+        response = self.client.put('/api/projects/edit/', {
+            'id': self.projects[0].id, 'name': 'Alpha', 'active_start_date': '2017-01-01', 'client_name': 'Client',
+            'git_url': 'https://example.com/project.git', 'libraries': [
+                {'id': entries[0].id, 'version': '1.0', 'remove': True}, {'id': entries[1].id, 'version': '2.1'},
+                {'id': self.libraries[0].id, 'version': '3.0', 'new': True}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self._assert_matches_list()
+
+        self.libraries[1].description = 'Renamed'
+        self.libraries[1].save()
+        models.ProjectLibrary.objects.create(project=self.projects[1], library=self.libraries[1], version='1.0')
+        self._assert_matches_list()
+
+        self.libraries[0].delete()
+        self._assert_matches_list()
+
+    def test_rebuild_updates_in_place(self):
+        models.ProjectSummary.objects.filter(project=self.projects[1]).delete()
+
+        with CaptureQueriesContext(connection) as context:
+            summaries.rebuild([project.id for project in self.projects])
+
+        # no delete-then-insert that concurrent rebuilds could interleave
+        self.assertFalse([query for query in context.captured_queries if query['sql'].startswith('DELETE')])
+        self.assertEqual(models.ProjectSummary.objects.get(project=self.projects[1]).libraries, '[]')
+        self._assert_matches_list()
+
+    def test_library_saves_rebuild_only_on_description_changes(self):
+        def summary_queries(library):
+            with CaptureQueriesContext(connection) as context:
+                library.save()
+
+            return [query for query in context.captured_queries if 'api_projectsummary' in query['sql']]
+
+        library = models.Library.objects.get(pk=self.libraries[1].pk)
+        library.active_end_date = date(2030, 1, 1)
+        self.assertFalse(summary_queries(library))
+
+        library.description = 'Renamed'
+        self.assertTrue(summary_queries(library))
+        self.assertFalse(summary_queries(library))
+        self._assert_matches_list()
+
+    def test_removed_with_project(self):
+        self.projects[0].delete()
+
+        self.assertEqual(list(models.ProjectSummary.objects.values_list('project_id', flat=True)),
+                         [self.projects[1].id])
+
+    def test_invalid_view(self):
+        self.assertEqual(self.client.get('/api/projects/', {'view': 'other'}).status_code, 400)
+
+
+# events are only published when a transaction commits
+class EventsTest(TransactionTestCase):
+    def setUp(self):
+        events.reset_broker()
+        self.client = APIClient()
+        self.last_id = events.get_broker().get_last_id()
+
+    def tearDown(self):
+        events.reset_broker()
+
+    def _events(self, last_id):
+        # the stream is read within the settings override, as it only starts when it is read
+        with override_settings(API_EVENTS_STREAM_SECONDS=0):
+            response = self.client.get('/api/events/', HTTP_LAST_EVENT_ID=str(last_id))
+            content = b''.join(response.streaming_content).decode('utf-8')
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        messages = []
+
+        for block in content.split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+
+            if 'event' in fields:
+                messages.append((fields['event'], json.loads(fields['data'])))
+
+        return messages
+
+    def test_changes_are_published(self):
+        library = create_library()
+        project = create_project(libraries=[(library, '1.0')])
+        project_id, entry_id = project.id, project.projectlibrary_set.get().id
+        project.delete()
+
+        self.assertEqual(self._events(self.last_id), [
+            ('change', {'model': 'library', 'action': 'saved', 'ids': [library.id]}),
+            ('change', {'model': 'project', 'action': 'saved', 'ids': [project_id]}),
+            ('change', {'model': 'projectlibrary', 'action': 'saved', 'ids': [entry_id]}),
+            ('change', {'model': 'projectlibrary', 'action': 'deleted', 'ids': [entry_id]}),
+            ('change', {'model': 'project', 'action': 'deleted', 'ids': [project_id]}),
+        ])
+
+    def test_bulk_writes_are_published(self):
+        response = self.client.post('/api/libraries/bulk/', [
+            {'action': 'create', 'description': 'New', 'active_start_date': '2017-01-01'}], format='json')
+        library_id = response.data['results'][0]['id']
+
+        self.assertEqual(self._events(self.last_id), [
+            ('change', {'model': 'library', 'action': 'saved', 'ids': [library_id]})])
+
+    def test_rolled_back_changes_are_not_published(self):
+        try:
+            with transaction.atomic():
+                create_library()
+                raise ValueError
+        except ValueError:
+            pass
+
+        self.assertEqual(self._events(self.last_id), [])
+
+    def test_missed_events_reset(self):
+        with override_settings(API_EVENTS_BUFFER_SIZE=1):
+            events.reset_broker()
+            last_id = events.get_broker().get_last_id()
+            libraries = [create_library(), create_library()]
+
+        # only the last event is kept
+        self.assertEqual(self._events(last_id), [('reset', {})])
+        self.assertEqual(self._events(last_id + 1), [
+            ('change', {'model': 'library', 'action': 'saved', 'ids': [libraries[1].id]})])
+        # an id from before a restart
+        self.assertEqual(self._events(0), [('reset', {})])
+
+    def test_invalid_event_id(self):
+        self.assertEqual(self.client.get('/api/events/', HTTP_LAST_EVENT_ID='x').status_code, 400)
+
+
+class ProjectPermissionTest(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+        self.user = create_project_user()
+        self.group = self.user.groups.get()
+
+    def test_result_is_cached(self):
+        self.assertTrue(utils.get_project_permissions(self.user))
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(utils.get_project_permissions(user))
+
+    def test_membership_changes_invalidate(self):
+        self.assertTrue(utils.get_project_permissions(self.user))
+        self.user.groups.remove(self.group)
+        self.assertFalse(utils.get_project_permissions(User.objects.get(pk=self.user.pk)))
+
+        self.group.user_set.add(self.user)
+        self.assertTrue(utils.get_project_permissions(User.objects.get(pk=self.user.pk)))
+
+    def test_group_permission_changes_invalidate(self):
+        self.assertTrue(utils.get_project_permissions(self.user))
+        self.group.permissions.remove(Permission.objects.get(codename='delete_project'))
+        self.assertFalse(utils.get_project_permissions(User.objects.get(pk=self.user.pk)))
+
+    def test_superuser_revocation_invalidates(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'testing123')
+        self.assertTrue(utils.get_project_permissions(user))
+
+        user.is_superuser = False
+        user.save()
+        self.assertFalse(utils.get_project_permissions(User.objects.get(pk=user.pk)))
+
+    def test_project_changes_require_privileges(self):
+        user = User.objects.create_user('other', password='testing123')
+        self.client.force_authenticate(user)
+        project = create_project()
+
+        self.assertEqual(self.client.get('/api/projects/').status_code, 200)
+        self.assertEqual(self.client.delete('/api/projects/delete/', {'id': project.id}, format='json').status_code,
+                         403)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.delete('/api/projects/delete/', {'id': project.id}, format='json').status_code,
+                         200)
+
+
+class ListCacheTest(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+        self.library = create_library('Library')
+        self.project = create_project('Alpha', [(self.library, '1.0')])
+
+    def test_repeated_list_is_served_from_cache(self):
+        for url in ('/api/libraries/', '/api/projects/'):
+            first = self.client.get(url, {'page_size': 10})
+
+            with self.assertNumQueries(0):
+                second = self.client.get(url, {'page_size': 10})
+
+            self.assertEqual(first.data, second.data)
+
+        self.assertEqual(cache.get_stats(), {'libraries': {'hits': 1, 'misses': 1},
+                                             'projects': {'hits': 1, 'misses': 1}})
+
+    def test_query_parameters_are_cached_separately(self):
+        self.client.get('/api/libraries/')
+        response = self.client.get('/api/libraries/', {'active': 'false'})
+
+        self.assertEqual(response.data['results'], [])
+
+    def test_cached_lists_expire_at_midnight(self):
+        create_library('Ending', active_end_date=date(2018, 6, 1))
+
+        with frozen_today(date(2018, 6, 1)):
+            self.assertEqual(len(self.client.get('/api/libraries/', {'active': 'true'}).data['results']), 2)
+
+        with frozen_today(date(2018, 6, 2)):
+            results = self.client.get('/api/libraries/', {'active': 'true'}).data['results']
+
+        self.assertEqual([library['description'] for library in results], ['Library'])
+
+    def test_changes_invalidate_dependent_lists(self):
+        self.client.get('/api/libraries/')
+        self.client.get('/api/projects/')
+
+        self.library.description = 'Renamed'
+        self.library.save()
+        self.assertEqual(self.client.get('/api/libraries/').data['results'][0]['description'], 'Renamed')
+        self.assertEqual(self.client.get('/api/projects/').data['results'][0]['libraries'][0]['description'],
+                         'Renamed')
+
+        models.ProjectLibrary.objects.filter(project=self.project).delete()
+        self.assertEqual(self.client.get('/api/projects/').data['results'][0]['libraries'], [])
+
+    def test_bulk_library_changes_invalidate_projects(self):
+        self.client.get('/api/projects/')
+        self.client.force_authenticate(create_project_user())
+        self.client.put('/api/projects/edit/', {'id': self.project.id, 'name': 'Alpha',
+                                                'active_start_date': '2017-01-01', 'client_name': 'Client',
+                                                'git_url': 'https://example.com/project.git',
+                                                'libraries': [{'id': self.library.id, 'version': '2.0',
+                                                               'new': True}]}, format='json')
+        libraries = self.client.get('/api/projects/').data['results'][0]['libraries']
+
+        self.assertEqual([library['version'] for library in libraries], ['1.0', '2.0'])
+
+    def test_stats_are_staff_only(self):
+        self.assertEqual(self.client.get('/api/cache_stats/').status_code, 403)
+
+        staff = User.objects.create_user('staff', password='testing123', is_staff=True)
+        self.client.force_authenticate(staff)
+        self.assertEqual(self.client.get('/api/cache_stats/').status_code, 200)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+        self.library = create_library('Library')
+        self.project = create_project('Alpha', [(self.library, '1.0')])
+        self.entry = self.project.projectlibrary_set.get()
+
+    def test_matching_etag_returns_not_modified(self):
+        for url in ('/api/libraries/', '/api/projects/', '/api/project_libraries/',
+                    '/api/project_libraries/{}/'.format(self.entry.id)):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-cache', response['Cache-Control'])
+            self.assertTrue(response.has_header('Last-Modified'))
+
+            with self.assertNumQueries(0):
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified.content, b'')
+
+    def test_etag_changes_with_data_and_parameters(self):
+        etag = self.client.get('/api/projects/')['ETag']
+
+        self.assertNotEqual(self.client.get('/api/projects/', {'page_size': 5})['ETag'], etag)
+        self.assertEqual(self.client.get('/api/projects/')['ETag'], etag)
+
+        self.library.description = 'Renamed'
+        self.library.save()
+        response = self.client.get('/api/projects/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+    def test_etag_changes_at_midnight(self):
+        # the library stops being active after its last day, without any write
+        create_library('Ending', active_end_date=date(2018, 6, 1))
+
+        with frozen_today(date(2018, 6, 1)):
+            response = self.client.get('/api/libraries/', {'active': 'true'})
+            self.assertEqual(self.client.get('/api/libraries/', {'active': 'true'},
+                                             HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        with frozen_today(date(2018, 6, 2)):
+            response = self.client.get('/api/libraries/', {'active': 'true'}, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([library['description'] for library in response.data['results']], ['Library'])
+
+
+class ProjectExportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.library = create_library('Library')
+
+    def _export(self, params=None):
+        response = self.client.get('/api/projects/export/', params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_empty_export(self):
+        self.assertEqual(json.loads(self._export()), [])
+        self.assertEqual(self._export({'output': 'ndjson'}), '')
+
+    def test_export_matches_list_across_chunks(self):
+        for i in range(5):
+            create_project('Project {}'.format(i), [(self.library, '1.{}'.format(i))])
+        listed = json.loads(self.client.get('/api/projects/', {'page_size': 10}).content.decode('utf-8'))['results']
+
+        with self.settings(API_EXPORT_CHUNK_SIZE=2):
+            exported = json.loads(self._export())
+            lines = self._export({'output': 'ndjson'}).splitlines()
+
+        self.assertEqual(exported, listed)
+        self.assertEqual([json.loads(line) for line in lines], listed)
+
+    def test_invalid_output(self):
+        self.assertEqual(self.client.get('/api/projects/export/', {'output': 'xml'}).status_code, 400)
+
+
+class FastSerializerTest(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+        libraries = [create_library('Library {}'.format(i), active_end_date=date(2020, 1, i + 1)) for i in range(2)]
+        libraries.append(create_library(u'Libr\xe4ry'))
+        create_project('Alpha', [(libraries[0], '1.0'), (libraries[2], '2.0')])
+        create_project('Beta')
+        create_project('Gamma', [(libraries[1], '3.0')])
+
+    def test_output_matches_drf_serializers(self):
+        for url in ('/api/libraries/', '/api/projects/', '/api/projects/export/'):
+            with self.settings(API_FAST_SERIALIZERS=True):
+                fast = self.client.get(url, {'page_size': 2})
+                fast_content = b''.join(fast.streaming_content) if fast.streaming else fast.content
+
+            django_cache.clear()
+
+            with self.settings(API_FAST_SERIALIZERS=False):
+                regular = self.client.get(url, {'page_size': 2})
+                regular_content = b''.join(regular.streaming_content) if regular.streaming else regular.content
+
+            self.assertEqual(fast_content, regular_content)
+
+
+class OffloadTest(TestCase):
+    def setUp(self):
+        offload.reset_pool()
+
+    def tearDown(self):
+        offload.reset_pool()
+
+    def test_submit_returns_before_the_call_ends(self):
+        started, release, done = threading.Event(), threading.Event(), threading.Event()
+
+        def call():
+            started.set()
+            release.wait(5)
+            done.set()
+
+        with self.settings(API_LIST_THREADS=1):
+            offload.submit(call)
+
+            self.assertTrue(started.wait(5))
+            self.assertFalse(done.is_set())
+            release.set()
+            self.assertTrue(done.wait(5))
+
+    def test_without_threads_submit_calls_right_away(self):
+        calls = []
+        offload.submit(calls.append, threading.current_thread())
+
+        self.assertEqual(calls, [threading.current_thread()])
+
+
+@skipUnless(pkgutil.find_loader('channels'), "channels is not installed")
+class ChannelRoutingTest(TestCase):
+    def _consumer(self, path):
+        from asgiref.inmemory import ChannelLayer
+        from channels.message import Message
+        from channels.routing import Router
+        from config import routing
+
+        message = Message({'path': path, 'reply_channel': 'http.response!test'}, 'http.request', ChannelLayer())
+        return Router(routing.channel_routing).match(message)[0]
+
+    def test_list_requests_are_offloaded(self):
+        from config import routing
+
+        self.assertIsInstance(self._consumer('/api/libraries/'), routing.OffloadedViewConsumer)
+        self.assertIsInstance(self._consumer('/api/projects/'), routing.OffloadedViewConsumer)
+        self.assertNotIsInstance(self._consumer('/api/projects/edit/'), routing.OffloadedViewConsumer)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+class ActiveDateIndexTest(TestCase):
+    def _query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def _assert_index_search(self, queryset):
+        plan = self._query_plan(queryset)
+        self.assertIn('SEARCH', plan)
+        self.assertIn('INDEX', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def _page_queries(self, queryset):
+        # the queries of the first and of a later page of a list, as KeysetPagination makes them
+        page_size = pagination.KeysetPagination.page_size
+        return queryset[:page_size + 1], queryset.filter(id__gt=1000)[:page_size + 1]
+
+    def test_date_filters_use_index(self):
+        self._assert_index_search(models.Library.objects.active_on(date(2017, 1, 1)))
+        self._assert_index_search(models.Project.objects.active_on(date(2017, 1, 1)))
+        self._assert_index_search(models.Library.objects.inactive_on(date(2017, 1, 1)))
+
+    def test_list_pages_follow_the_id_order(self):
+        # the list endpoints page in id order, which the date indexes cannot give: their pages are read in primary
+        # key order, stopping after a page of matches, and later pages start from the cursor with a key search, so
+        # a page never sorts the matching rows
+        libraries = viewsets.LibraryViewSet().get_queryset()
+
+        for queryset in (libraries.active_on(date(2017, 1, 1)), libraries.inactive_on(date(2017, 1, 1)),
+                         models.Project.objects.order_by('id').active_on(date(2017, 1, 1))):
+            first, later = [self._query_plan(query) for query in self._page_queries(queryset)]
+
+            self.assertNotIn('TEMP B-TREE', first + later)
+            self.assertNotIn('USING INDEX', first)
+            self.assertIn('SEARCH', later)
+            self.assertIn('PRIMARY KEY', later)
+
+
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.middleware = replicas.ReplicaMiddleware()
+        self.factory = RequestFactory()
+
+    def _route_read(self, request):
+        self.middleware.process_request(request)
+        alias = self.router.db_for_read(models.Project)
+        response = self.middleware.process_response(request, HttpResponse())
+        return alias, response
+
+    @override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+    def test_safe_requests_read_from_replicas(self):
+        alias, response = self._route_read(self.factory.get('/api/projects/'))
+
+        self.assertIn(alias, ['replica1', 'replica2'])
+        self.assertNotIn(replicas.PIN_COOKIE_NAME, response.cookies)
+        self.assertEqual(self.router.db_for_write(models.Project), 'default')
+        self.assertEqual(self.router.db_for_read(models.Project), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_writes_pin_the_client_to_the_primary(self):
+        alias, response = self._route_read(self.factory.put('/api/projects/edit/'))
+
+        self.assertEqual(alias, 'default')
+        self.assertIn(replicas.PIN_COOKIE_NAME, response.cookies)
+
+        request = self.factory.get('/api/projects/')
+        request.COOKIES[replicas.PIN_COOKIE_NAME] = '1'
+        alias, _ = self._route_read(request)
+
+        self.assertEqual(alias, 'default')
+
+    def test_without_replicas_everything_uses_the_primary(self):
+        alias, _ = self._route_read(self.factory.get('/api/projects/'))
+
+        self.assertEqual(alias, 'default')
+
+    @contextmanager
+    def _replica(self, alias):
+        # a connection under the replica alias, sharing the test database (and transaction) of the primary one
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        replica = primary.__class__(dict(primary.settings_dict), alias)
+        replica.connection = primary.connection
+        connections[alias] = replica
+
+        try:
+            with CaptureQueriesContext(replica) as context:
+                yield context
+        finally:
+            replica.connection = None
+            del connections[alias]
+
+    def _age_changes(self):
+        # as if the last change was made long enough ago for the replicas to have it
+        for table in ('library', 'project', 'projectlibrary'):
+            django_cache.set(cache._modified_key(table), int(time.time()) - 60, None)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_lists_read_from_replicas(self):
+        django_cache.clear()
+        create_library()
+        self._age_changes()
+
+        with self._replica('replica1') as context:
+            response = APIClient().get('/api/libraries/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertTrue([query for query in context.captured_queries if query['sql'].startswith('SELECT')
+                         and 'api_library' in query['sql']])
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_lists_of_recently_changed_tables_read_from_the_primary(self):
+        django_cache.clear()
+        create_library()
+
+        with self._replica('replica1') as context:
+            response = APIClient().get('/api/libraries/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertFalse(context.captured_queries)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_sync_reads_from_the_primary(self):
+        # 'replica1' is not a database here, so any read routed to it fails
+        request = self.factory.get('/api/sync/', {'since': sync.get_token()})
+        self.middleware.process_request(request)
+
+        try:
+            response = viewsets.SyncViewSet.as_view({'get': 'list'})(request)
+        finally:
+            self.middleware.process_response(request, HttpResponse())
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_streamed_responses_keep_their_routing_until_closed(self):
+        request = self.factory.get('/api/projects/export/')
+        aliases = []
+
+        def content():
+            aliases.append(self.router.db_for_read(models.Project))
+            yield ''
+
+        self.middleware.process_request(request)
+        response = self.middleware.process_response(request, StreamingHttpResponse(content()))
+        list(response)
+
+        self.assertEqual(aliases, ['replica1'])
+
+        response.close()
+
+        self.assertEqual(self.router.db_for_read(models.Project), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'api'))
+        self.assertTrue(self.router.allow_migrate('default', 'api'))
+
+
+@skipUnless(pkgutil.find_loader('psycopg2'), "psycopg2 is not installed")
+class ConnectionPoolTest(TestCase):
+    class ExhaustedPool(object):
+        # a pool with no connection to give out for the first 'busy_attempts' attempts
+        closed = False
+
+        def __init__(self, busy_attempts):
+            self.busy_attempts = busy_attempts
+
+        def getconn(self):
+            from psycopg2.pool import PoolError
+
+            if self.busy_attempts:
+                self.busy_attempts -= 1
+                raise PoolError("connection pool exhausted")
+
+            return 'connection'
+
+    def _wrapper(self, pool, timeout):
+        from config.backends.postgresql_pool import base
+
+        wrapper = base.DatabaseWrapper(dict(connection.settings_dict, POOL_TIMEOUT=timeout))
+        wrapper.pool = pool
+        return wrapper
+
+    def test_waits_for_a_connection(self):
+        self.assertEqual(self._wrapper(self.ExhaustedPool(2), 5).get_connection_from_pool(), 'connection')
+
+    def test_wait_is_bounded(self):
+        from psycopg2.pool import PoolError
+
+        with self.assertRaises(PoolError):
+            self._wrapper(self.ExhaustedPool(1000), 0.1).get_connection_from_pool()
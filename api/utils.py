@@ -1,36 +1,57 @@
 # Authored by Peter Garas for Ocom Software
 
-from datetime import datetime
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from django.core.cache import cache as django_cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, router, transaction
+from django.db.models import AutoField, Case, Value, When
+from django.utils import timezone
 from rest_framework.authentication import BasicAuthentication
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from . import cache, validation
 
 
-def get_project_permissions(user):
+def _has_project_group_permissions(user):
     group_permissions = user.get_group_permissions()
     valid_perms = ['api.change_project', 'api.delete_project', 'api.add_project']
     intersect = set(valid_perms).intersection(group_permissions)
     return len(intersect) == 3
 
 
-def validate_date(date_text):
-    try:
-        datetime.strptime(date_text, '%Y-%m-%d')
-    except ValueError:
+def get_project_permissions(user):
+    """
+    Whether the user has the project privileges. The result is cached per user until the user's group membership,
+    the permissions of any group or the user's superuser status change (see api/signals.py); superusers have every
+    permission.
+    """
+    if not user.is_authenticated or not user.is_active:
         return False
-    else:
-        return True
 
+    key = 'api:project_permissions:{}:{}:{}:{}'.format(user.pk, int(user.is_superuser),
+                                                        cache.get_version('group_permissions'),
+                                                        cache.get_version('user_groups:{}'.format(user.pk)))
+    result = django_cache.get(key)
+
+    if result is None:
+        result = _has_project_group_permissions(user)
+        django_cache.set(key, result, None)
+
+    return result
+
+
+def validate_date(date_text):
+    return validation.parse_iso_date(date_text) is not None
 
-def validate_date_entries(data):
-    date_field_keys = ['active_start_date', 'active_end_date']
 
-    for field_key in date_field_keys:
-        date_field = data.get(field_key)
+def parse_date(date_text):
+    return validation.parse_iso_date(date_text)
 
-        if date_field is not None:
-            if not validate_date(date_field):
-                return False, {"detail": "Invalid format for {}: must be \"YYYY-mm-dd\"".format(field_key)}
 
-    return True, {}
+def validate_date_entries(data):
+    errors = validation.validate_dates(data)
+    return not errors, errors
 
 
 def get_param_flags(param):
@@ -47,6 +68,202 @@ def get_param_flags(param):
     return inside, outside
 
 
+def get_bool_param(param):
+    if isinstance(param, basestring):
+        value, _ = get_param_flags(param)
+        return value
+
+    if isinstance(param, bool):
+        return param
+
+    return False
+
+
+def get_date_filter_params(query_params):
+    """
+    Reads the 'active_on' (YYYY-mm-dd) and 'active_between' (YYYY-mm-dd,YYYY-mm-dd) query parameters.
+
+    Returns a (result, filters, response_data) tuple where filters holds the parsed 'active_on' date and
+    'active_between' date pair (None when the parameter is absent).
+    """
+    filters = {'active_on': None, 'active_between': None}
+    active_on = query_params.get('active_on')
+    active_between = query_params.get('active_between')
+
+    if active_on is not None:
+        filters['active_on'] = parse_date(active_on)
+
+        if filters['active_on'] is None:
+            return False, filters, {"detail": "Invalid format for active_on: must be \"YYYY-mm-dd\""}
+
+    if active_between is not None:
+        dates = [parse_date(date_text) for date_text in active_between.split(',')]
+
+        if len(dates) != 2 or None in dates:
+            return False, filters, {
+                "detail": "Invalid format for active_between: must be \"YYYY-mm-dd,YYYY-mm-dd\""}
+
+        if dates[0] > dates[1]:
+            return False, filters, {"detail": "Invalid active_between range: start date is after end date"}
+
+        filters['active_between'] = tuple(dates)
+
+    return True, filters, {}
+
+
+def bulk_update(model, values, fields, batch_size=100):
+    """
+    Sets fields of many rows with a single UPDATE statement per batch of rows (Django 1.10 has no bulk_update).
+    'values' maps each primary key to a dict holding the new value of every field in 'fields'. Batches keep each
+    statement within the database's limit on query parameters. Fields with auto_now are set to the current time,
+    as save() would.
+    """
+    pks = list(values)
+    now = timezone.now()
+    auto_now_fields = [field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start:start + batch_size]
+        changes = {}
+
+        for field in fields:
+            output_field = model._meta.get_field(field)
+            changes[field] = Case(*[When(pk=pk, then=Value(values[pk][field], output_field=output_field))
+                                    for pk in batch], output_field=output_field)
+
+        for field in auto_now_fields:
+            changes[field] = now
+
+        model.objects.filter(pk__in=batch).update(**changes)
+
+
+def bulk_create(model, objects):
+    """
+    Inserts many rows with bulk_create() and returns the objects with their primary keys set. Backends that do not
+    return the ids of bulk inserted rows (SQLite) hold the database write lock from the insert until the end of the
+    transaction, so there the new rows are the ones with the highest ids: call it inside transaction.atomic().
+    """
+    objects = list(objects)
+    model.objects.bulk_create(objects)
+
+    if objects and objects[0].pk is None:
+        ids = sorted(model.objects.order_by('-pk').values_list('pk', flat=True)[:len(objects)])
+
+        for instance, pk in zip(objects, ids):
+            instance.pk = pk
+
+    return objects
+
+
+def bulk_insert_ignore(model, objects):
+    """
+    Inserts many rows, skipping the ones that would break a unique constraint (including duplicates among the
+    objects themselves), with "INSERT OR IGNORE" on SQLite and "INSERT ... ON CONFLICT DO NOTHING" on PostgreSQL, and
+    with a savepoint per row on other databases. Repeating the same insert is therefore harmless. Returns the number of
+    rows inserted.
+    """
+    objects = list(objects)
+
+    if not objects:
+        return 0
+
+    connection = connections[router.db_for_write(model)]
+
+    if connection.vendor == 'sqlite':
+        statement = 'INSERT OR IGNORE INTO {} ({}) VALUES {}'
+    elif connection.vendor == 'postgresql':
+        statement = 'INSERT INTO {} ({}) VALUES {} ON CONFLICT DO NOTHING'
+    else:
+        return _insert_each_ignoring_conflicts(model, objects, connection.alias)
+
+    fields = [field for field in model._meta.local_concrete_fields if not isinstance(field, AutoField)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    row_placeholders = '({})'.format(', '.join(['%s'] * len(fields)))
+    batch_size = max(connection.ops.bulk_batch_size(fields, objects), 1)
+    inserted = 0
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(objects), batch_size):
+            batch = objects[start:start + batch_size]
+            params = [field.get_db_prep_save(field.pre_save(instance, True), connection)
+                      for instance in batch for field in fields]
+            cursor.execute(statement.format(table, columns, ', '.join([row_placeholders] * len(batch))), params)
+            inserted += cursor.rowcount
+
+    return inserted
+
+
+def _insert_each_ignoring_conflicts(model, objects, using):
+    # one insert per row, each in its own savepoint so that a conflict only skips that row
+    inserted = 0
+
+    for instance in objects:
+        try:
+            with transaction.atomic(using=using):
+                model._base_manager.using(using).bulk_create([instance])
+        except IntegrityError:
+            continue
+
+        inserted += 1
+
+    return inserted
+
+
+@contextmanager
+def scratch_database():
+    """
+    Points the default connection at a throwaway database for the duration of the block, for the benchmark and
+    load test commands: a copy of the SQLite file, or a test database created like the test runner does on other
+    databases. The configured database itself is not touched.
+    """
+    # every thread's connection is built from the same settings dict, so they all follow the new NAME
+    connection = connections[DEFAULT_DB_ALIAS]
+    name = connection.settings_dict['NAME']
+    connection.close()
+
+    if connection.vendor == 'sqlite':
+        directory = tempfile.mkdtemp()
+        copy = os.path.join(directory, 'scratch.sqlite3')
+
+        # with write-ahead logging, the latest commits may still be in the -wal file
+        for suffix in ('', '-wal'):
+            if os.path.exists(name + suffix):
+                shutil.copy(name + suffix, copy + suffix)
+
+        connection.settings_dict['NAME'] = copy
+
+        try:
+            yield
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = name
+            shutil.rmtree(directory)
+    else:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            yield
+        finally:
+            connection.close()
+
+            # connections that threads gave back to a pool (see config/backends/postgresql_pool) would keep the
+            # test database from being dropped
+            if getattr(connection, 'pool', None) is not None:
+                connection.pool.closeall()
+
+            connection.creation.destroy_test_db(name, verbosity=0)
+
+
 class QuietBasicAuthentication(BasicAuthentication):
     def authenticate_header(self, request):
         return 'xBasic realm="{}"'.format(self.www_authenticate_realm)
+
+
+class ProjectPermission(BasePermission):
+    """
+    Read access for everybody, changes only for users with the project privileges (see get_project_permissions)
+    """
+
+    def has_permission(self, request, view):
+        return request.method in SAFE_METHODS or get_project_permissions(request.user)
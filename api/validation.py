@@ -0,0 +1,81 @@
+# Authored by Peter Garas for Ocom Software
+
+# Active date validation
+#
+# Dates are checked with a precompiled regular expression and the datetime.date constructor instead of
+# datetime.strptime(), which looks up its format in a lock-protected cache and runs a locale-aware parser on every
+# call. The accepted input is the same: "YYYY-mm-dd", with one or two digit months and days.
+
+import re
+from datetime import date
+
+DATE_FIELDS = ('active_start_date', 'active_end_date')
+
+# \Z, as $ would also match before a trailing newline
+_DATE_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})\Z')
+
+
+def parse_iso_date(date_text):
+    """
+    Returns the date of a "YYYY-mm-dd" string, or None if it is not one (or not a valid date).
+    """
+    try:
+        match = _DATE_PATTERN.match(date_text)
+    except TypeError:
+        return None
+
+    if match is None:
+        return None
+
+    try:
+        return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+
+def _validate_dates(record, parse):
+    dates = {}
+
+    for field_key in DATE_FIELDS:
+        date_text = record.get(field_key)
+
+        if date_text is None:
+            continue
+
+        dates[field_key] = parse(date_text)
+
+        if dates[field_key] is None:
+            return {"detail": "Invalid format for {}: must be \"YYYY-mm-dd\"".format(field_key)}
+
+    if len(dates) == 2 and dates['active_end_date'] < dates['active_start_date']:
+        return {"detail": "Invalid dates: active_end_date must not be earlier than active_start_date"}
+
+    return {}
+
+
+def validate_dates(record):
+    """
+    Returns the errors of the active dates of a record (a dict), or an empty dict if they are valid: the dates that
+    are given must be "YYYY-mm-dd" strings, and the end date must not be earlier than the start date.
+    """
+    return _validate_dates(record, parse_iso_date)
+
+
+def validate_date_records(records):
+    """
+    Validates the active dates of a batch of records in one call. Returns a list with the errors of every record
+    (see validate_dates), in the order of the records. Every distinct date string of the batch is only parsed once.
+    """
+    parsed = {}
+
+    def parse(date_text):
+        try:
+            return parsed[date_text]
+        except KeyError:
+            parsed[date_text] = parse_iso_date(date_text)
+            return parsed[date_text]
+        except TypeError:
+            # not hashable, so not a date string either
+            return None
+
+    return [_validate_dates(record, parse) for record in records]
@@ -0,0 +1,211 @@
+# Authored by Peter Garas for Ocom Software
+
+# Sortable library versions
+#
+# ProjectLibrary.version is free-form text, so it cannot be compared in SQL ("1.10.0" < "1.9.0" as strings). Every
+# version that looks like a (semver-style) version number also gets a sort key, stored next to it in
+# ProjectLibrary.version_key, that compares as text in version order:
+#
+#   - up to MAX_COMPONENTS numeric components, each zero-padded to COMPONENT_WIDTH digits ("1.2" is "1.2.0.0");
+#   - then "-<pre-release>" for pre-releases (numeric identifiers zero-padded too), or "~" for releases, so a
+#     pre-release sorts before its release ("~" sorts after every pre-release character).
+#
+# A leading "v" and build metadata ("+...") are ignored. Versions that do not start with a number have no key.
+#
+# Ranges (see parse_range) use npm's semver syntax: comparators (<, <=, >, >=, =) separated by spaces must all match,
+# "||" separates alternatives, and "^1.2.3", "~1.2.3", "1.2.x" (or a partial "1.2") and "1.2.3 - 2.0.0" are
+# shorthands for the usual comparator pairs. They translate to range conditions on the sort key, which the
+# ProjectLibrary indexes serve.
+
+import re
+from django.db import models
+from django.db.models import Q
+
+MAX_COMPONENTS = 4
+COMPONENT_WIDTH = 10
+
+_VERSION_PATTERN = re.compile(
+    r'\s*[vV]?(\d+(?:\.\d+)*)(?:[-.]?([0-9A-Za-z][0-9A-Za-z.-]*))?(?:\+[0-9A-Za-z.-]*)?\s*$')
+_PARTIAL_PATTERN = re.compile(r'[vV]?(\d+|[xX*])(?:\.(\d+|[xX*]))?(?:\.(\d+|[xX*]))?(?:\.(\d+|[xX*]))?$')
+_COMPARATOR_PATTERN = re.compile(r'(<=|>=|<|>|=|\^|~|)\s*([^\s<>=^~|]+)')
+
+
+class InvalidRange(ValueError):
+    pass
+
+
+def _numeric_key(numbers):
+    numbers = list(numbers)[:MAX_COMPONENTS]
+    numbers += [0] * (MAX_COMPONENTS - len(numbers))
+    return '.'.join(str(number).zfill(COMPONENT_WIDTH) for number in numbers)
+
+
+def _pre_release_key(pre_release):
+    return '.'.join(part.zfill(COMPONENT_WIDTH) if part.isdigit() else part.lower() for part in pre_release.split('.'))
+
+
+def version_key(version):
+    """
+    Returns the sort key of a version string, or None if it is not a version number.
+    """
+    match = _VERSION_PATTERN.match(version or '')
+
+    if match is None:
+        return None
+
+    numbers, pre_release = match.groups()
+
+    if len(numbers.split('.')) > MAX_COMPONENTS:
+        return None
+
+    key = _numeric_key(int(number) for number in numbers.split('.'))
+    return key + ('-' + _pre_release_key(pre_release) if pre_release else '~')
+
+
+def _lowest_key(numbers):
+    # sorts before every version starting with 'numbers', pre-releases included
+    return _numeric_key(numbers) + '-'
+
+
+def _bump(numbers):
+    return numbers[:-1] + [numbers[-1] + 1]
+
+
+def _invalid(text):
+    raise InvalidRange("Invalid version range: \"{}\"".format(text))
+
+
+def _partial(text):
+    # the numbers of a partial version ("1", "1.2", "1.x", "*", ...) up to the first wildcard, or None if it is a
+    # complete version (or not a version at all)
+    match = _PARTIAL_PATTERN.match(text)
+
+    if match is None:
+        return None
+
+    numbers = []
+
+    for part in match.groups():
+        if part is None:
+            break
+
+        if not part.isdigit():
+            return numbers
+
+        numbers.append(int(part))
+
+    return numbers if len(numbers) < 3 else None
+
+
+def _comparator(operator, version):
+    """
+    Returns the Q condition on the version key of a single comparator or shorthand.
+    """
+    partial = _partial(version)
+    key = version_key(version) if partial is None else None
+
+    if partial is None and key is None:
+        _invalid(operator + version)
+
+    if partial == []:
+        # "*", "x", "^x", ...: every version; except "<*" and ">*", which match nothing
+        return Q(pk__in=[]) if operator in ('<', '>') else Q()
+
+    if operator in ('^', '~'):
+        numbers = partial or [int(number) for number in _VERSION_PATTERN.match(version).group(1).split('.')]
+
+        if operator == '^':
+            # up to the next change of the first non-zero component
+            significant = next((index for index, number in enumerate(numbers) if number), len(numbers) - 1)
+            upper = _bump(numbers[:significant + 1])
+        else:
+            upper = _bump(numbers[:2])
+
+        return Q(version_key__gte=key or _lowest_key(partial), version_key__lt=_lowest_key(upper))
+
+    if partial is not None:
+        # a partial version stands for every version starting with it
+        lower, upper = _lowest_key(partial), _lowest_key(_bump(partial))
+        return {
+            '': Q(version_key__gte=lower, version_key__lt=upper),
+            '=': Q(version_key__gte=lower, version_key__lt=upper),
+            '<': Q(version_key__lt=lower),
+            '<=': Q(version_key__lt=upper),
+            '>': Q(version_key__gte=upper),
+            '>=': Q(version_key__gte=lower),
+        }[operator]
+
+    return {
+        '': Q(version_key=key),
+        '=': Q(version_key=key),
+        '<': Q(version_key__lt=key),
+        '<=': Q(version_key__lte=key),
+        '>': Q(version_key__gt=key),
+        '>=': Q(version_key__gte=key),
+    }[operator]
+
+
+def parse_range(text):
+    """
+    Returns the Q condition on ProjectLibrary.version_key matching a semver-style version range, e.g.
+    ">=1.2.0 <2.0.0", "^1.2.3 || ~2.0" or "1.2.3 - 1.4". Raises InvalidRange if it is not one.
+    """
+    alternatives = []
+
+    for alternative in (text or '').split('||'):
+        bounds = re.split(r'\s+-\s+', alternative.strip())
+
+        if len(bounds) == 2:
+            # "<a> - <b>" is ">=<a> <=<b>"
+            comparators = [('>=', bounds[0]), ('<=', bounds[1])]
+        else:
+            comparators = _COMPARATOR_PATTERN.findall(alternative)
+
+            # every character must belong to a comparator
+            if not comparators or _COMPARATOR_PATTERN.sub('', alternative).strip():
+                _invalid(alternative.strip())
+
+        condition = Q()
+
+        for operator, version in comparators:
+            condition &= _comparator(operator, version)
+
+        alternatives.append(condition)
+
+    condition = alternatives[0]
+
+    for alternative in alternatives[1:]:
+        condition |= alternative
+
+    return condition
+
+
+class VersionKeyField(models.CharField):
+    """
+    Holds the sort key of the version in another field of the same model, which is updated whenever the row is saved
+    (including bulk_create()). Queryset update() calls have to set it themselves (see version_key).
+    """
+
+    def __init__(self, source='version', *args, **kwargs):
+        self.source = source
+        kwargs.setdefault('max_length', 254)
+        kwargs.setdefault('null', True)
+        kwargs.setdefault('editable', False)
+        super(VersionKeyField, self).__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super(VersionKeyField, self).deconstruct()
+
+        if self.source != 'version':
+            kwargs['source'] = self.source
+
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = version_key(getattr(model_instance, self.source))
+
+        if value is not None:
+            value = value[:self.max_length]
+
+        setattr(model_instance, self.attname, value)
+        return value
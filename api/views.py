@@ -1,15 +1,13 @@
 # Authored by Peter Garas for Ocom Software
 
-from datetime import datetime
 from django.conf import settings
 from django.db import IntegrityError
-from django.db.models import Q
-from django.http import JsonResponse
-from django.views.generic import TemplateView
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.generic import TemplateView, View
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from . import models, serializers, utils
+from . import events, models, serializers, utils
 
 
 class HomeView(TemplateView):
@@ -23,23 +21,44 @@ class HomeView(TemplateView):
         return context
 
 
+class EventStreamView(View):
+    """
+    Server-Sent Events stream of the changes to the libraries and projects (see api/events.py)
+
+        Usage: Listen with an EventSource, which reconnects (sending the id of the last event it received in the
+        "Last-Event-ID" header) whenever a stream ends after API_EVENTS_STREAM_SECONDS
+        [GET]: /api/events/
+
+        The "change" events hold the 'model' ("library", "project" or "projectlibrary"), the 'action' ("saved" or
+        "deleted") and the 'ids' of the changed rows. A "reset" event means that some changes were missed.
+    """
+
+    def get(self, request, *args, **kwargs):
+        last_id = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_event_id')
+
+        try:
+            last_id = int(last_id) if last_id else None
+        except ValueError:
+            return JsonResponse({"detail": "Invalid event id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(events.stream(last_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # keeps proxies (e.g. nginx) from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 # The following views are deactivated in favor of ViewSets. please refer to api/viewsets.py
 class LibraryView(APIView):
     def get(self, request, *args, **kwargs):
         active = request.query_params.get('active', False)
         inactive = request.query_params.get('inactive', False)
-        now = datetime.now()
+        libraries = models.Library.objects.order_by('id')
 
         if active:
-            libraries = models.Library.objects.filter(active_start_date__lte=now)
-            libraries = libraries.filter(Q(active_end_date__gte=now) | Q(active_end_date__isnull=True))
+            libraries = libraries.active_on()
         elif inactive:
-            all_libraries = models.Library.objects.all()
-            active_libraries = all_libraries.filter(active_start_date__lte=now)
-            active_libraries = active_libraries.filter(Q(active_end_date__gte=now) | Q(active_end_date__isnull=True))
-            libraries = set(all_libraries).difference(active_libraries)
-        else:
-            libraries = models.Library.objects.all()
+            libraries = libraries.inactive_on()
 
         serializer = serializers.LibrarySerializer(libraries, many=True)
         return JsonResponse(serializer.data, safe=False)
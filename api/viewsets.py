@@ -1,15 +1,19 @@
 # Authored by Peter Garas for Ocom Software
 
-from datetime import datetime
+from django.conf import settings
 from django.contrib import auth
 from django.contrib.auth.models import User
-from django.db import IntegrityError
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from rest_framework import status, viewsets, mixins
-from rest_framework.decorators import list_route
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.decorators import detail_route, list_route
+from rest_framework.exceptions import ParseError, PermissionDenied
+from rest_framework.permissions import IsAdminUser
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.response import Response
-from . import serializers, models, utils
+from config import replicas
+from . import cache, events, importer, pagination, search, serializers, models, summaries, sync, utils, versions
 
 
 class AuthViewSet(mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
@@ -55,7 +59,43 @@ class AuthViewSet(mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.Ge
         return Response({})
 
 
-class LibraryViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, viewsets.GenericViewSet):
+class FastListMixin(object):
+    """
+    Serializes list pages with fast_serializer_class (see the fast-path serializers in api/serializers.py) when the
+    API_FAST_SERIALIZERS setting is on, and with serializer_class otherwise.
+    """
+
+    fast_serializer_class = None
+
+    def get_list_data(self, queryset):
+        if getattr(settings, 'API_FAST_SERIALIZERS', True):
+            page = self.paginate_queryset(self.fast_serializer_class.get_rows(queryset))
+            serializer = self.fast_serializer_class(page)
+        else:
+            page = self.paginate_queryset(queryset)
+            serializer = self.serializer_class(page, many=True)
+
+        return self.get_paginated_response(serializer.data).data
+
+
+class SearchMixin(object):
+    """
+    Full-text search (see api/search.py) for list actions: search_queryset() narrows a list to the records matching
+    the 'q' query parameter, ordered by relevance, and switches the list to offset pagination.
+    """
+
+    def search_queryset(self, queryset):
+        text = self.request.query_params.get('q')
+
+        if not text:
+            return queryset
+
+        self._paginator = pagination.SearchPagination()
+        return search.search(queryset, text)
+
+
+class LibraryViewSet(SearchMixin, FastListMixin, mixins.CreateModelMixin, mixins.UpdateModelMixin,
+                     viewsets.GenericViewSet):
     """
     The Resource Library Viewset
 
@@ -72,6 +112,29 @@ class LibraryViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, viewsets.
         Usage: Get inactive library items (see above)
         [GET]: /api/libraries/?active=false
 
+        Usage: Get library items that are active on a given date
+        [GET]: /api/libraries/?active_on=YYYY-mm-dd
+
+        Usage: Get library items that are active at any time within a date range (inclusive)
+        [GET]: /api/libraries/?active_between=YYYY-mm-dd,YYYY-mm-dd
+
+        Usage: Search library descriptions for all of the given words (the last one may be partly typed); may be
+        combined with the filters above
+        [GET]: /api/libraries/?q=<words>
+
+        Usage: Get the next page of library items, using the 'next' link of the previous page
+        [GET]: /api/libraries/?cursor=<cursor>
+
+        Note: results are paginated and ordered by id. Each response holds the 'results' of the current page and
+        the 'next' and 'previous' page links (null at either end of the list). The page size defaults to the
+        API_PAGE_SIZE setting and may be set per request with the 'page_size' parameter
+
+        Note: search results are ordered by relevance instead, with the 'count' of matches and offset based 'next'
+        and 'previous' links
+
+        Note: responses carry ETag and Last-Modified headers. Repeating a request with an If-None-Match header that
+        still matches returns "304 Not Modified" with no body
+
     <b>create:</b>
     Append a new library item to the Library list
 
@@ -93,12 +156,43 @@ class LibraryViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, viewsets.
                 'active_start_date':    Active Start Date
                 'active_end_date':      (optional) Active End Date
 
+    <b>projects:</b>
+    Obtain the projects using a library item, grouped by version: every result holds a 'version', the 'count' of
+    projects using it and their 'project_ids'. Results are ordered by version and paginated with a 'next' link.
+
+        Usage:
+        [GET]: /api/libraries/{id}/projects/
+            where the optional 'page_size' query parameter sets the number of versions per page
+
+    <b>bulk:</b>
+    Create, edit and remove many library items in a single request
+
+        Usage:
+        [POST]: /api/libraries/bulk/
+            where POST data is an array of operations, each including the following:
+                'action':               'create', 'update' or 'delete'
+                'id':                   (required for update and delete) the library record id
+                'description':          (create and update) the name or title of the library
+                'active_start_date':    (create and update) Active Start Date
+                'active_end_date':      (optional, create and update) Active End Date
+
+        All operations are validated before any of them is applied, and they are applied together in a single
+        transaction: if any operation is invalid, nothing is saved. The response holds one result per operation
+        ('index', 'action', 'id', 'status' and 'errors'), in the order they were sent.
+
     """
 
     queryset = models.Library.objects.all()
     serializer_class = serializers.LibrarySerializer
+    fast_serializer_class = serializers.FastLibrarySerializer
+    pagination_class = pagination.KeysetPagination
+    bulk_fields = ('description', 'active_start_date', 'active_end_date')
     invalid_put_request = {"detail": "Invalid request: Please check your \"PUT\" data"}
 
+    def get_queryset(self):
+        return models.Library.objects.order_by('id')
+
+    @cache.conditional('libraries')
     def list(self, request, *args, **kwargs):
         active_param = request.query_params.get('active')
 
@@ -108,23 +202,29 @@ class LibraryViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, viewsets.
             active = False
             get_all = True
 
-        if get_all:
-            libraries = models.Library.objects.all()
-        else:
-            now = datetime.now()
+        result, date_filters, response_data = utils.get_date_filter_params(request.query_params)
 
-            if active:
-                libraries = models.Library.objects.all().filter(active_start_date__lte=now)
-                libraries = libraries.filter(Q(active_end_date__gte=now) | Q(active_end_date__isnull=True))
-            else:
-                all_libraries = models.Library.objects.all()
-                active_libraries = all_libraries.filter(active_start_date__lte=now)
-                active_libraries = active_libraries.filter(Q(active_end_date__gte=now) |
-                                                           Q(active_end_date__isnull=True))
-                libraries = set(all_libraries).difference(active_libraries)
+        if not result:
+            return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+
+        def build():
+            libraries = self.get_queryset()
 
-        serializer = self.serializer_class(libraries, many=True)
-        return Response(serializer.data)
+            if not get_all:
+                if active:
+                    libraries = libraries.active_on()
+                else:
+                    libraries = libraries.inactive_on()
+
+            if date_filters['active_on'] is not None:
+                libraries = libraries.active_on(date_filters['active_on'])
+
+            if date_filters['active_between'] is not None:
+                libraries = libraries.active_between(*date_filters['active_between'])
+
+            return self.get_list_data(self.search_queryset(libraries))
+
+        return Response(cache.cached_response_data('libraries', request, build))
 
     def create(self, request, *args, **kwargs):
         try:
@@ -151,6 +251,117 @@ class LibraryViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, viewsets.
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @detail_route(methods=['get'])
+    @cache.conditional('project_libraries')
+    def projects(self, request, pk=None, *args, **kwargs):
+        library = self.get_object()
+        paginator = pagination.VersionGroupPagination()
+        groups = paginator.paginate_entries(models.ProjectLibrary.objects.filter(library=library), request)
+        return paginator.get_paginated_response(groups)
+
+    def _parse_bulk_operations(self, operations):
+        """
+        Validates every operation of a bulk request in one pass. Returns the per-item results along with the
+        validated creates (index, data), updates {library id: (index, data)} and deletes {library id: index}.
+        """
+        results, creates, updates, deletes = [], [], {}, {}
+
+        for index, operation in enumerate(operations):
+            result = {'index': index, 'action': None, 'id': None, 'status': 'error', 'errors': {}}
+            results.append(result)
+
+            if not isinstance(operation, dict) or operation.get('action') not in ('create', 'update', 'delete'):
+                result['errors'] = {"detail": "Invalid operation: 'action' must be create, update or delete"}
+                continue
+
+            result['action'] = operation['action']
+
+            if operation['action'] != 'create':
+                try:
+                    result['id'] = int(operation.get('id'))
+                except (TypeError, ValueError):
+                    pass
+
+            if operation['action'] != 'create' and (result['id'] is None or result['id'] in updates or
+                                                    result['id'] in deletes):
+                result['errors'] = {"detail": "Invalid operation: a unique library 'id' is required"}
+                continue
+
+            if operation['action'] == 'delete':
+                deletes[result['id']] = index
+                continue
+
+            data = dict((key, operation.get(key)) for key in self.bulk_fields)
+
+            if data['active_end_date'] == '':
+                data['active_end_date'] = None
+
+            valid, response_data = utils.validate_date_entries(data)
+
+            if not valid:
+                result['errors'] = response_data
+                continue
+
+            serializer = self.serializer_class(data=data)
+
+            if not serializer.is_valid():
+                result['errors'] = serializer.errors
+                continue
+
+            if operation['action'] == 'create':
+                creates.append((index, serializer.validated_data))
+            else:
+                updates[result['id']] = (index, serializer.validated_data)
+
+        # updated and deleted libraries must exist; all of them are checked with a single query
+        existing = set(models.Library.objects.filter(pk__in=list(updates) + list(deletes))
+                       .values_list('id', flat=True))
+
+        for library_id, index in list(deletes.items()) + [(pk, item[0]) for pk, item in updates.items()]:
+            if library_id not in existing:
+                results[index]['errors'] = {"detail": "Invalid operation: library not found"}
+
+        return results, creates, updates, deletes
+
+    @list_route(methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        operations = request.data
+
+        if not isinstance(operations, list):
+            return Response({"detail": "Invalid request: \"POST\" data must be an array of operations"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results, creates, updates, deletes = self._parse_bulk_operations(operations)
+
+        if any(result['errors'] for result in results):
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if deletes:
+                models.Library.objects.filter(pk__in=list(deletes)).delete()
+
+            if updates:
+                utils.bulk_update(models.Library, dict((pk, data) for pk, (_, data) in updates.items()),
+                                  self.bulk_fields)
+
+            if creates:
+                libraries = utils.bulk_create(models.Library, (models.Library(**data) for _, data in creates))
+
+                for (index, _), library in zip(creates, libraries):
+                    results[index]['id'] = library.pk
+
+            # bulk_create() and update() do not send model signals
+            saved = [result['id'] for result in results if result['action'] != 'delete']
+            cache.bump_version('library')
+            search.reindex(models.Library, saved)
+            summaries.rebuild_for_libraries(saved)
+            events.publish('library', 'saved', saved)
+
+        for result in results:
+            result['status'] = {'create': 'created', 'update': 'updated', 'delete': 'deleted'}[result['action']]
+
+        return Response({'results': results})
+
     @list_route(methods=['put'])
     def edit(self, request, *args, **kwargs):
         try:
@@ -182,17 +393,35 @@ class LibraryViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, viewsets.
         return Response(self.invalid_put_request, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ProjectViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin,
-                     viewsets.GenericViewSet):
+class ProjectViewSet(SearchMixin, FastListMixin, mixins.CreateModelMixin, mixins.UpdateModelMixin,
+                     mixins.DestroyModelMixin, viewsets.GenericViewSet):
     """
     The Project Viewset
 
+    Note: creating, editing and removing project items requires the project privileges (the 'project access' group
+    permissions)
+
     <b>list:</b>
     Obtain all project items
 
         Usage:
         [GET]: /api/projects/
 
+        Usage: Search project names, client names and descriptions for all of the given words (the last one may be
+        partly typed), best matches first
+        [GET]: /api/projects/?q=<words>
+
+        Usage: Get the project items with the libraries read from the precomputed project summaries (see
+        api/summaries.py) instead of the library tables, and their number in 'library_count'; may be combined with
+        the search above
+        [GET]: /api/projects/?view=summary
+
+        Usage: Get the next page of project items, using the 'next' link of the previous page
+        [GET]: /api/projects/?cursor=<cursor>
+
+        Note: results are paginated and ordered by id, or by relevance when searching (see the 'list' notes of the
+        Resource Library Viewset)
+
     <b>create:</b>
     Append a new project item to the Project list
 
@@ -216,8 +445,12 @@ class ProjectViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.De
                 'version':              The version number used for this project i.e. "1.4.6" or "1.5.alpha", etc.
                 'new':                  If this is set to true, the library item will be included in the project
                 'remove':               If this is set to true, the library item will be removed from the project. If
-                                        both this and the new parameter value is set to true, the new parameter is
-                                        ignored
+                                        both this and the new parameter value is set to true, the item is ignored
+                                        as it was never saved
+
+            Entries that are neither new nor removed update the version of an existing project library item, whose
+            record id is then given in 'id'. The whole array is validated before anything is saved, and the project
+            and all of its library changes are saved in a single transaction.
 
     <b>update:</b>
     Edit a project item
@@ -239,6 +472,28 @@ class ProjectViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.De
                 'libraries':            (optional) An array of library entries. For more info on how to use this, see
                                         the 'libraries' parameter on Project.create
 
+    <b>export:</b>
+    Download every project item in a single response that is streamed in chunks, so that the server's memory use
+    stays flat however many projects there are
+
+        Usage: Export as a JSON array
+        [GET]: /api/projects/export/
+
+        Usage: Export as newline-delimited JSON (one project per line)
+        [GET]: /api/projects/export/?output=ndjson
+
+    <b>import:</b>
+    Create many project items (with their libraries) from an uploaded CSV or NDJSON file. The file is read as a
+    stream and saved in chunks of API_IMPORT_CHUNK_SIZE rows, one transaction per chunk. Invalid rows are skipped;
+    the response counts the rows processed, imported and failed, and lists the errors of the first failed rows. See
+    api/importer.py for the file formats.
+
+        Usage:
+        [POST]: /api/projects/import/
+            where POST data is a multipart form including the following:
+                'file':                 (required) the CSV (.csv) or NDJSON (.ndjson or .jsonl) file
+            and the optional query parameter 'input' ("csv" or "ndjson") overrides the format given by the file name
+
     <b>remove:</b>
     Remove a project item
 
@@ -250,63 +505,124 @@ class ProjectViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.De
 
     queryset = models.Project.objects.all()
     serializer_class = serializers.ProjectSerializer
+    fast_serializer_class = serializers.FastProjectSerializer
+    pagination_class = pagination.KeysetPagination
+    permission_classes = (utils.ProjectPermission,)
     invalid_put_request = {"detail": "Invalid request: Please check your \"PUT\" data"}
+    invalid_library_request = {"detail": "Invalid request: Please check your \"POST/PUT\" library data"}
 
+    def get_queryset(self):
+        # load the whole project/library graph up front: one query for the projects and one for all of their
+        # library entries (joined with the library table), regardless of how many projects there are
+        project_libraries = models.ProjectLibrary.objects.select_related('library').order_by('id')
+        return models.Project.objects.prefetch_related(Prefetch('projectlibrary_set', queryset=project_libraries))
+
+    @cache.conditional('projects')
     def list(self, request, *args, **kwargs):
-        projects = models.Project.objects.all()
-        serializer = serializers.ProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+        list_view = request.query_params.get('view')
+
+        if list_view not in (None, 'summary'):
+            raise ParseError("Invalid view: must be \"summary\"")
+
+        def build():
+            queryset = self.search_queryset(self.get_queryset())
+
+            if list_view == 'summary':
+                page = self.paginate_queryset(serializers.ProjectSummarySerializer.get_rows(queryset))
+                return self.get_paginated_response(serializers.ProjectSummarySerializer(page).data).data
+
+            return self.get_list_data(queryset)
+
+        return Response(cache.cached_response_data('projects', request, build))
+
+    def _parse_library_entries(self, project_id, libraries):
+        """
+        Validates a 'libraries' payload as a whole before anything is written. Returns a (result, response_data)
+        tuple where, on success, response_data holds the project library ids to remove, the ProjectLibrary rows to
+        insert and a {project library id: version} map of version updates.
+        """
+        removals, inserts, updates = [], [], {}
+
+        if not isinstance(libraries, list):
+            return False, self.invalid_library_request
 
-    def _save_library_entries(self, project_id, libraries):
         for library in libraries:
-            remove_param = library.get('remove')
-            if isinstance(remove_param, basestring):
-                remove, _ = utils.get_param_flags(remove_param)
-            elif isinstance(remove_param, bool):
-                remove = remove_param
-            else:
-                remove = False
+            if not isinstance(library, dict):
+                return False, self.invalid_library_request
+
+            # a library id for new entries, a project library id otherwise; "5" and 5 are the same entry
+            try:
+                entry_id = int(library.get('id'))
+            except (TypeError, ValueError):
+                return False, self.invalid_library_request
+
+            remove = utils.get_bool_param(library.get('remove'))
+            is_new = utils.get_bool_param(library.get('new'))
 
             if remove:
-                try:
-                    models.ProjectLibrary.objects.filter(pk=library.get('id')).delete()
-                except models.ProjectLibrary.DoesNotExist:
-                    return False, {"detail": "Invalid request: Please check your \"POST/PUT\" data"}
+                # entries that were added and removed again before saving were never stored
+                if not is_new:
+                    removals.append(entry_id)
+                continue
+
+            lib = {
+                'library_id': entry_id,
+                'version': library.get('version'),
+                'project_id': project_id
+            }
+            serializer = serializers.LibraryVersionySerializer(data=lib)
+
+            if not serializer.is_valid():
+                return False, serializer.errors
+
+            if is_new:
+                inserts.append(models.ProjectLibrary(**lib))
             else:
-                lib = {
-                    'library_id': library['id'],
-                    'version': library['version'],
-                    'project_id': project_id
-                }
-
-                new_param = library.get('new')
-                if isinstance(new_param, basestring):
-                    is_new, _ = utils.get_param_flags(new_param)
-                elif isinstance(new_param, bool):
-                    is_new = new_param
-                else:
-                    is_new = False
+                updates[entry_id] = serializer.validated_data['version']
 
-                if new_param:
-                    serializer = serializers.LibraryVersionySerializer(data=lib)
+        # all referenced rows are checked with one query per table
+        library_ids = set(entry.library_id for entry in inserts)
 
-                    if serializer.is_valid():
-                        models.ProjectLibrary.objects.create(**lib)
-                    else:
-                        return False, serializer.errors
-                else:
-                    try:
-                        entry = models.ProjectLibrary.objects.get(pk=library.get('id'))
-                    except models.ProjectLibrary.DoesNotExist:
-                        return False, {
-                            "detail":
-                                "Invalid request: Changes to library data not saved. Please check your "
-                                "\"POST/PUT\" data"}
-                    else:
-                        try:
-                            entry.save(update_fields=lib)
-                        except IntegrityError as err:
-                            return False, {"detail": str(err)}
+        if len(library_ids) != models.Library.objects.filter(pk__in=library_ids).count():
+            return False, self.invalid_library_request
+
+        if len(updates) != models.ProjectLibrary.objects.filter(pk__in=updates.keys(), project_id=project_id).count():
+            return False, {
+                "detail": "Invalid request: Changes to library data not saved. Please check your \"POST/PUT\" data"}
+
+        return True, {'removals': removals, 'inserts': inserts, 'updates': updates}
+
+    def _save_library_entries(self, project_id, libraries):
+        """
+        Applies a 'libraries' payload to a project with a fixed number of statements per batch of entries (one
+        delete, one bulk insert and one update) inside a single transaction, so either every change is saved or none
+        is.
+        """
+        result, entries = self._parse_library_entries(project_id, libraries)
+
+        if not result:
+            return False, entries
+
+        try:
+            with transaction.atomic():
+                if entries['removals']:
+                    models.ProjectLibrary.objects.filter(pk__in=entries['removals'], project_id=project_id).delete()
+
+                if entries['inserts']:
+                    # entries the project already has are skipped, so a repeated request adds nothing
+                    utils.bulk_insert_ignore(models.ProjectLibrary, entries['inserts'])
+
+                if entries['updates']:
+                    utils.bulk_update(models.ProjectLibrary, dict(
+                        (pk, {'version': version, 'version_key': versions.version_key(version)})
+                        for pk, version in entries['updates'].items()), ['version', 'version_key'])
+
+                # bulk_create() and update() do not send model signals
+                cache.bump_version('projectlibrary')
+                summaries.rebuild([project_id])
+                events.publish('project', 'saved', [project_id])
+        except IntegrityError as err:
+            return False, {"detail": str(err)}
 
         return True, {}
 
@@ -332,17 +648,20 @@ class ProjectViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.De
         serializer = self.serializer_class(data=request.data)
 
         if serializer.is_valid():
-            try:
-                project = serializer.save()
-            except IntegrityError as err:
-                return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                try:
+                    project = serializer.save()
+                except IntegrityError as err:
+                    transaction.set_rollback(True)
+                    return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # we need to retrieve the newly-created project here
-            if libs:
-                result, response_data = self._save_library_entries(project.id, libs)
+                # we need to retrieve the newly-created project here
+                if libs:
+                    result, response_data = self._save_library_entries(project.id, libs)
 
-                if not result:
-                    return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+                    if not result:
+                        transaction.set_rollback(True)
+                        return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
             return Response(serializer.data)
 
@@ -367,19 +686,101 @@ class ProjectViewSet(mixins.CreateModelMixin, mixins.UpdateModelMixin, mixins.De
         if 'libraries' in data:
             del data['libraries']
 
+        result, response_data = utils.validate_date_entries(data)
+
+        if not result:
+            return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+
         if project:
-            if data:
-                serializer = serializers.ProjectSerializer(project, data=data)
+            with transaction.atomic():
+                if data:
+                    serializer = serializers.ProjectSerializer(project, data=data)
+
+                    if not serializer.is_valid():
+                        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-                if serializer.is_valid():
                     serializer.save()
 
-            self._save_library_entries(data['id'], libs)
+                result, response_data = self._save_library_entries(project.id, libs)
+
+                if not result:
+                    transaction.set_rollback(True)
+                    return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+
             return Response(request.data)
 
         return Response({"detail": "Invalid request: Please check your \"PUT\" data"},
                         status=status.HTTP_400_BAD_REQUEST)
 
+    def _export_pages(self):
+        # keyset-paginated chunks of projects (with their libraries), so only one chunk is held in memory
+        chunk_size = getattr(settings, 'API_EXPORT_CHUNK_SIZE', 500)
+        fast = getattr(settings, 'API_FAST_SERIALIZERS', True)
+        last_id = 0
+
+        while True:
+            projects = self.get_queryset().filter(id__gt=last_id).order_by('id')
+
+            if fast:
+                rows = self.fast_serializer_class.get_rows(projects)[:chunk_size]
+                page = self.fast_serializer_class(rows).data
+            else:
+                page = serializers.ProjectSerializer(projects[:chunk_size], many=True).data
+
+            if not page:
+                return
+
+            yield page
+            last_id = page[-1]['id']
+
+    def _export_json(self):
+        encoder = JSONEncoder()
+        separator = '['
+
+        for page in self._export_pages():
+            for project in page:
+                yield separator + encoder.encode(project)
+                separator = ','
+
+        yield '[]' if separator == '[' else ']'
+
+    def _export_ndjson(self):
+        encoder = JSONEncoder()
+
+        for page in self._export_pages():
+            yield ''.join(encoder.encode(project) + '\n' for project in page)
+
+    @list_route(methods=['get'])
+    def export(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'json')
+
+        if output == 'ndjson':
+            response = StreamingHttpResponse(self._export_ndjson(), content_type='application/x-ndjson')
+        elif output == 'json':
+            response = StreamingHttpResponse(self._export_json(), content_type='application/json')
+        else:
+            return Response({"detail": "Invalid output: must be \"json\" or \"ndjson\""},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        response['Content-Disposition'] = 'attachment; filename="projects.{}"'.format(output)
+        return response
+
+    @list_route(methods=['post'], url_path='import')
+    def import_projects(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+
+        if upload is None:
+            return Response({"detail": "Invalid request: a \"file\" upload is required"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        input_format = importer.get_format(request.query_params.get('input') or upload.name)
+
+        if input_format is None:
+            return Response({"detail": "Invalid input: must be \"csv\" or \"ndjson\""},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(importer.import_projects(upload, input_format))
+
     @list_route(methods=['delete'])
     def delete(self, request, *args, **kwargs):
         try:
@@ -397,7 +798,100 @@ class ProjectLibraryViewSet(viewsets.ModelViewSet):
     ViewSet for Project and Library relation table 
     
     Note: you should see the version field here
+
+    <b>list:</b>
+    Obtain the project library entries, optionally filtered
+
+        Usage:
+        [GET]: /api/project_libraries/
+            with the optional query parameters:
+                'library':              a library record id
+                'project':              a project record id
+                'version':              a semver-style version range, e.g. "<2.3.1", ">=1.2.0 <2.0.0", "^1.2.3",
+                                        "~1.2", "1.x", "1.2.0 - 1.4" or alternatives separated by "||". Entries
+                                        whose version is not a version number never match.
     """
 
-    queryset = models.ProjectLibrary.objects.all()
+    queryset = models.ProjectLibrary.objects.select_related('library')
     serializer_class = serializers.ProjectLibrarySerializer
+
+    def get_queryset(self):
+        queryset = super(ProjectLibraryViewSet, self).get_queryset()
+
+        if self.action != 'list':
+            return queryset
+
+        for param in ('library', 'project'):
+            value = self.request.query_params.get(param)
+
+            if value is not None:
+                if not value.isdigit():
+                    raise ParseError("Invalid {}: must be a record id".format(param))
+
+                queryset = queryset.filter(**{'{}_id'.format(param): int(value)})
+
+        version_range = self.request.query_params.get('version')
+
+        if version_range is not None:
+            try:
+                queryset = queryset.filter(versions.parse_range(version_range))
+            except versions.InvalidRange as err:
+                raise ParseError(str(err))
+
+        return queryset
+
+    @cache.conditional('project_libraries')
+    def list(self, request, *args, **kwargs):
+        return super(ProjectLibraryViewSet, self).list(request, *args, **kwargs)
+
+    @cache.conditional('project_libraries')
+    def retrieve(self, request, *args, **kwargs):
+        return super(ProjectLibraryViewSet, self).retrieve(request, *args, **kwargs)
+
+
+class CacheStatsViewSet(viewsets.ViewSet):
+    """
+    Hit and miss counters of the server-side API list cache (staff only)
+
+        Usage:
+        [GET]: /api/cache_stats/
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def list(self, request, *args, **kwargs):
+        return Response(cache.get_stats())
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Changes to the libraries and projects since a change token, for clients that keep a copy of them
+
+        Usage: Get a token to start from, before loading the library and project lists
+        [GET]: /api/sync/
+
+        Usage: Get the changes since a token
+        [GET]: /api/sync/?since=<token>
+
+        The response holds the next 'token', the changed (or new) 'libraries' and 'projects' in the same form as in
+        their lists, and the ids of the 'deleted' libraries, projects and project_libraries. Consecutive responses
+        may repeat a change. A token older than API_SYNC_RETENTION_DAYS is answered with "410 Gone": load the lists
+        again and start over.
+    """
+
+    def list(self, request, *args, **kwargs):
+        token = request.query_params.get('since')
+
+        if token is None:
+            return Response({'token': sync.get_token()})
+
+        try:
+            since = sync.decode_token(token)
+        except sync.InvalidToken as err:
+            return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
+        except sync.ExpiredToken as err:
+            return Response({"detail": str(err)}, status=status.HTTP_410_GONE)
+
+        # from the primary: the next token would skip the rows a lagging replica has not received yet
+        with replicas.primary():
+            return Response(sync.get_changes(since))
@@ -0,0 +1,23 @@
+"""
+ASGI config for interview_test project.
+
+It exposes the channel layer as a module-level variable named ``channel_layer``. An interface server holds the client
+connections and passes the requests through the channel layer to worker processes, which run the views:
+
+    DJANGO_CHANNEL_LAYER=redis daphne config.asgi:channel_layer
+    DJANGO_CHANNEL_LAYER=redis python manage.py runworker
+
+Requires channels 1.x (see DJANGO_CHANNEL_LAYER in config/settings.py).
+
+For more information on this file, see
+https://channels.readthedocs.io/en/1.x/deploying.html
+"""
+
+import os
+
+from channels.asgi import get_channel_layer
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ.setdefault("DJANGO_CHANNEL_LAYER", "redis")
+
+channel_layer = get_channel_layer()
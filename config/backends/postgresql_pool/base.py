@@ -0,0 +1,74 @@
+"""
+PostgreSQL backend with an in-process connection pool.
+
+Works like django.db.backends.postgresql, except that connections are taken from (and given back to) a
+psycopg2 ThreadedConnectionPool shared by all threads of the process instead of being opened and closed. Together
+with CONN_MAX_AGE this keeps the number of server connections bounded and avoids connection setup on every
+request. The pool size is set with the 'POOL_MIN_SIZE' and 'POOL_MAX_SIZE' keys of the database settings.
+
+A thread keeps its connection between requests for up to CONN_MAX_AGE seconds, so POOL_MAX_SIZE should be at least
+the number of threads of a process that use the database: the server's worker threads, plus API_LIST_THREADS under
+ASGI (see api/offload.py). Beyond that, a thread waits up to 'POOL_TIMEOUT' seconds for another to give a connection back
+before failing. The pools of all processes together must stay within the server's max_connections.
+"""
+
+import threading
+import time
+
+from django.db.backends.postgresql import base
+from psycopg2 import pool
+
+# seconds between attempts to take a connection from an exhausted pool
+RETRY_INTERVAL = 0.05
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params):
+        # one pool per set of connection parameters (the test database gets its own)
+        key = tuple(sorted(conn_params.items()))
+
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = pool.ThreadedConnectionPool(self.settings_dict.get('POOL_MIN_SIZE', 1),
+                                                          self.settings_dict.get('POOL_MAX_SIZE', 20),
+                                                          **conn_params)
+
+        return _pools[key]
+
+    def get_connection_from_pool(self):
+        deadline = time.time() + self.settings_dict.get('POOL_TIMEOUT', 10)
+
+        while True:
+            try:
+                return self.pool.getconn()
+            except pool.PoolError:
+                # exhausted (or closed): wait for a connection to be given back, for up to POOL_TIMEOUT seconds
+                if self.pool.closed or time.time() >= deadline:
+                    raise
+
+                time.sleep(RETRY_INTERVAL)
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        connection = self.get_connection_from_pool()
+
+        # see django.db.backends.postgresql.base.DatabaseWrapper.get_new_connection
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # the pool rolls back anything left open and discards connections that were closed or broken
+                return self.pool.putconn(self.connection, close=bool(self.connection.closed))
@@ -0,0 +1,18 @@
+"""
+SQLite backend that tunes every new connection.
+
+Works like django.db.backends.sqlite3 and then runs the PRAGMA statements listed in the 'PRAGMAS' key of the database
+settings (e.g. {'journal_mode': 'WAL', 'synchronous': 'NORMAL'}) on each connection it opens.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            connection.execute('PRAGMA {} = {}'.format(name, value))
+
+        return connection
@@ -0,0 +1,91 @@
+"""
+Read replica routing.
+
+ReplicaMiddleware marks safe (GET/HEAD/OPTIONS) requests as allowed to read from a replica, and ReplicaRouter then
+sends their queries to one of the DATABASE_REPLICAS aliases. Everything else (writes, and every query of unsafe
+requests) goes to the 'default' primary database.
+
+To let a client read its own writes while the replicas catch up, an unsafe request sets a cookie that pins the
+client's following requests to the primary for REPLICA_PIN_SECONDS, the time the replicas are assumed to take. For
+the same time after a table changed, the API reads that are cached or ETagged under the table's version also run on
+the primary (see api/cache.py), so that no client caches rows older than that version.
+"""
+
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE_NAME = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def use_replicas(enabled):
+    _state.use_replicas = enabled
+
+
+@contextmanager
+def primary():
+    """
+    Sends the reads made inside the block to the primary, whatever the request.
+    """
+    enabled = getattr(_state, 'use_replicas', False)
+    use_replicas(False)
+
+    try:
+        yield
+    finally:
+        use_replicas(enabled)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter(object):
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+
+        if replicas and getattr(_state, 'use_replicas', False):
+            return random.choice(replicas)
+
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
+
+
+def reset_routing(**kwargs):
+    use_replicas(False)
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        use_replicas(request.method in SAFE_METHODS and PIN_COOKIE_NAME not in request.COOKIES)
+
+    def process_response(self, request, response):
+        # a streamed response is read after this, so its routing is only reset once the server closes it (see
+        # reset_routing)
+        if not response.streaming:
+            use_replicas(False)
+
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE_NAME, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                                httponly=True)
+
+        return response
+
+
+request_finished.connect(reset_routing, dispatch_uid='config.replicas.reset_routing')
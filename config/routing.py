@@ -0,0 +1,20 @@
+"""
+Channel routing for the ASGI deployment (see config/asgi.py): HTTP requests go to the Django views, the library and
+project lists through the list thread pool (see api/offload.py) so that building them does not hold up the worker.
+"""
+
+from channels.handler import ViewConsumer
+from channels.routing import route
+
+from api import offload
+
+
+class OffloadedViewConsumer(ViewConsumer):
+    def __call__(self, message):
+        offload.submit(super(OffloadedViewConsumer, self).__call__, message)
+
+
+channel_routing = [
+    route('http.request', OffloadedViewConsumer(), path=r'^/api/(?:libraries|projects)/$'),
+    route('http.request', ViewConsumer()),
+]
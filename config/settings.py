@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/1.9/ref/settings/
 """
 
 import os
+from collections import OrderedDict
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -50,6 +53,7 @@ MIDDLEWARE_CLASSES = [
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'config.replicas.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -72,17 +76,117 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# ASGI deployment (see config/asgi.py), chosen with the DJANGO_CHANNEL_LAYER environment variable; requires channels
+# 1.x (pip install "channels<2"):
+#   redis     a Redis server at REDIS_URL, shared by the interface server (daphne) and the worker processes; also
+#             requires asgi_redis
+#   inmemory  a single process channel layer, for "python manage.py runserver" (which then serves over ASGI)
+
+CHANNEL_LAYER_PROFILE = os.environ.get('DJANGO_CHANNEL_LAYER')
+
+if CHANNEL_LAYER_PROFILE:
+    INSTALLED_APPS.append('channels')
+
+if CHANNEL_LAYER_PROFILE == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'asgi_redis.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [os.environ.get('REDIS_URL', 'redis://localhost:6379')],
+            },
+            'ROUTING': 'config.routing.channel_routing',
+        }
+    }
+elif CHANNEL_LAYER_PROFILE == 'inmemory':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'asgiref.inmemory.ChannelLayer',
+            'ROUTING': 'config.routing.channel_routing',
+        }
+    }
+elif CHANNEL_LAYER_PROFILE:
+    raise ImproperlyConfigured("Unknown DJANGO_CHANNEL_LAYER: {}".format(CHANNEL_LAYER_PROFILE))
+
 
 # Database
 # https://docs.djangoproject.com/en/1.9/ref/settings/#databases
 
-DATABASES = {
+# The database profile is chosen with the DJANGO_DB_PROFILE environment variable:
+#   sqlite      (default) the bundled db.sqlite3 file, tuned with the PRAGMAS below
+#   postgresql  a PostgreSQL server configured with the POSTGRES_* environment variables, using persistent
+#               connections (DJANGO_CONN_MAX_AGE seconds) taken from an in-process connection pool of up to
+#               DJANGO_DB_POOL_SIZE connections, waited for up to DJANGO_DB_POOL_TIMEOUT seconds when they are all in
+#               use (see config/backends/postgresql_pool for sizing it); requires psycopg2
+
+DATABASE_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'sqlite')
+
+if DATABASE_PROFILE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'config.backends.postgresql_pool',
+            'NAME': os.environ.get('POSTGRES_DB', 'interview_test'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+            'POOL_MIN_SIZE': 1,
+            'POOL_MAX_SIZE': int(os.environ.get('DJANGO_DB_POOL_SIZE', 20)),
+            'POOL_TIMEOUT': float(os.environ.get('DJANGO_DB_POOL_TIMEOUT', 10)),
+        }
+    }
+elif DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'config.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            # run on every new connection (see config/backends/sqlite3): write-ahead logging so that readers are not
+            # blocked by a writer, fsync only at checkpoints, a 64 MB page cache, 256 MB of memory-mapped I/O and
+            # waiting up to 5 seconds for a lock instead of failing with "database is locked" straight away
+            'PRAGMAS': OrderedDict((
+                ('journal_mode', 'WAL'),
+                ('synchronous', 'NORMAL'),
+                ('cache_size', -64000),
+                ('mmap_size', 268435456),
+                ('busy_timeout', 5000),
+            )),
+        }
+    }
+else:
+    raise ImproperlyConfigured("Unknown DJANGO_DB_PROFILE: {}".format(DATABASE_PROFILE))
+
+# Read replicas (see config/replicas.py): safe requests read from one of these database aliases, chosen at random.
+# They are listed in DJANGO_DB_REPLICAS, comma separated: PostgreSQL host names for the postgresql profile, or
+# database file paths for the sqlite profile (e.g. a copy of db.sqlite3 standing in for a replica when testing
+# locally). After a write, a client keeps reading from the primary for REPLICA_PIN_SECONDS.
+
+DATABASE_REPLICAS = []
+
+for index, replica in enumerate(filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(','))):
+    alias = 'replica{}'.format(index + 1)
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    DATABASES[alias]['HOST' if DATABASE_PROFILE == 'postgresql' else 'NAME'] = replica.strip()
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['config.replicas.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/1.10/topics/cache/
+# The local memory cache is per process: use a shared backend (e.g. memcached) when running several workers, so that
+# a change made through one worker invalidates the cached API lists of all of them.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Seconds an API list response stays cached (entries are also invalidated as soon as the data changes)
+API_LIST_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
@@ -126,3 +230,34 @@ STATICFILES_DIRS = [
 ]
 
 APPLICATION_NAME = 'Interview Test'
+
+# Default page size of the paginated API lists (see api/pagination.py), which the 'page_size' query parameter
+# overrides up to API_MAX_PAGE_SIZE. Not REST_FRAMEWORK['PAGE_SIZE'], which would paginate every other list as well.
+API_PAGE_SIZE = 100
+
+# Upper bound for the 'page_size' query parameter on paginated API lists
+API_MAX_PAGE_SIZE = 1000
+
+# Number of projects loaded from the database at a time by the streaming project export
+API_EXPORT_CHUNK_SIZE = 500
+
+# Number of rows inserted per transaction by the bulk project import (see api/importer.py)
+API_IMPORT_CHUNK_SIZE = 500
+
+# Delta sync (see api/sync.py): the overlap between consecutive sync responses, covering transactions that commit
+# late, and the days deletions are remembered for
+API_SYNC_WINDOW_SECONDS = 5
+API_SYNC_RETENTION_DAYS = 30
+
+# Change events (see api/events.py): the broker class, the number of recent events kept for reconnecting clients, and
+# how long an event stream stays open (and a worker thread busy) before the client reconnects
+API_EVENTS_BROKER = 'api.events.LocalBroker'
+API_EVENTS_BUFFER_SIZE = 1000
+API_EVENTS_STREAM_SECONDS = 60
+API_EVENTS_HEARTBEAT_SECONDS = 15
+
+# Threads per ASGI worker running the library and project list requests (see api/offload.py); 0 runs them in the worker
+API_LIST_THREADS = int(os.environ.get('DJANGO_LIST_THREADS', 0))
+
+# Serialize API list responses with the fast-path serializers (see api/serializers.py) instead of the DRF ones
+API_FAST_SERIALIZERS = True
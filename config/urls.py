@@ -11,9 +11,12 @@ router.register(r'auth', viewsets.AuthViewSet)
 router.register(r'libraries', viewsets.LibraryViewSet)
 router.register(r'projects', viewsets.ProjectViewSet)
 router.register(r'project_libraries', viewsets.ProjectLibraryViewSet)
+router.register(r'cache_stats', viewsets.CacheStatsViewSet, base_name='cache_stats')
+router.register(r'sync', viewsets.SyncViewSet, base_name='sync')
 
 
 urlpatterns = [
+    url(r'^api/events/$', views.EventStreamView.as_view(), name='events'),
     url(r'^api/', include(router.urls)),
     url(r'^admin/', admin.site.urls),
     url(r'^$', views.HomeView.as_view(), name='project'),
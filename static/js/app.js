@@ -6,7 +6,9 @@ projectApp = angular.module('projectApp', ['ngResource', 'ngRoute', 'project.con
 projectApp.config(['$httpProvider', function($httpProvider){
         $httpProvider.defaults.xsrfCookieName = 'csrftoken';
         $httpProvider.defaults.xsrfHeaderName = 'X-CSRFToken';
-        $httpProvider.defaults.headers.common['Cache-Control'] = 'no-cache';
+        // API lists are sent with ETags and "Cache-Control: no-cache", so the browser revalidates them with
+        // If-None-Match on every request and only downloads them again when they have changed. Angular's own
+        // in-memory cache would skip that check, so it stays off.
         $httpProvider.defaults.cache = false;
     }]).
     config(function($routeProvider) {
@@ -93,32 +95,114 @@ projectApp.factory('auth', function($resource) {
             });
         }
     }).
-    factory('library', function($resource) {
-        return {
-            list: $resource('/api/libraries\\/', {}, {
-                get: {
-                    method: 'GET',
-                    isArray: true
+    factory('pager', function($http, alertService) {
+        // Reads a cursor-paginated API list (see api/pagination.py) by following its 'next' links. get() hands
+        // the results of each page to on_page as soon as the page arrives and calls on_done after the last one,
+        // while get_all() collects every page before calling back. A page that fails to load ends the list there,
+        // with an alert.
+        return function(url, params) {
+            function get(on_page, on_done) {
+                function fetch(page_url, page_params) {
+                    $http.get(page_url, {params: page_params}).then(function(response) {
+                        on_page(response.data.results);
+                        if (response.data.next) {
+                            fetch(response.data.next, {});
+                        } else if (on_done) {
+                            on_done();
+                        }
+                    }, function() {
+                        alertService.add('danger', "Error: unable to load the whole list, please reload the page.");
+                        if (on_done) {
+                            on_done();
+                        }
+                    });
                 }
-            }),
-            active_list: $resource('/api/libraries\\/', {}, {
-                get: {
-                    method: 'GET',
-                    params: {
-                        active: 'true'
-                    },
-                    isArray: true
+                fetch(url, params || {});
+            }
+
+            return {
+                get: get,
+                get_all: function(callback) {
+                    var results = [];
+
+                    get(function(page) {
+                        Array.prototype.push.apply(results, page);
+                    }, function() {
+                        callback(results);
+                    });
                 }
-            }),
-            inactive_list: $resource('/api/libraries\\/', {}, {
-                get: {
-                    method: 'GET',
-                    params: {
-                        active: 'false'
-                    },
-                    isArray: true
+            };
+        };
+    }).
+    factory('sync', function($http) {
+        // Delta sync (see api/sync.py): start() gets a token before the lists are loaded (null when it cannot be
+        // had, so that the lists still load), and changes() gets what changed since a token, along with the token to
+        // use next time. on_expired is called when the token is too old to sync from, and the lists have to be
+        // loaded again.
+        return {
+            start: function(callback) {
+                $http.get('/api/sync/').then(function(response) {
+                    callback(response.data.token);
+                }, function() {
+                    callback(null);
+                });
+            },
+            changes: function(token, on_changes, on_expired) {
+                $http.get('/api/sync/', {params: {since: token}}).then(function(response) {
+                    on_changes(response.data);
+                }, function(response) {
+                    if (response.status === 410 && on_expired) {
+                        on_expired();
+                    }
+                });
+            }
+        };
+    }).
+    factory('events', function($window, $timeout) {
+        // Change events (see api/events.py): listen() calls on_change with the names of the models that changed on
+        // the server (all of them when some changes were missed), at most once per batch of events, until the
+        // returned function is called. Browsers without EventSource get no live updates.
+        return {
+            listen: function(on_change) {
+                var source, pending, changed = {};
+
+                if (!$window.EventSource) {
+                    return angular.noop;
                 }
-            }),
+                source = new $window.EventSource('/api/events/');
+
+                function notify(models) {
+                    angular.forEach(models, function (model) {
+                        changed[model] = true;
+                    });
+                    if (!pending) {
+                        pending = $timeout(function () {
+                            var models = changed;
+
+                            pending = null;
+                            changed = {};
+                            on_change(models);
+                        }, 250);
+                    }
+                }
+                source.addEventListener('change', function (event) {
+                    notify([angular.fromJson(event.data).model]);
+                });
+                source.addEventListener('reset', function () {
+                    notify(['library', 'project', 'projectlibrary']);
+                });
+                return function () {
+                    source.close();
+                    $timeout.cancel(pending);
+                };
+            }
+        };
+    }).
+    factory('library', function($resource, pager) {
+        return {
+            list: pager('/api/libraries/'),
+            active_list: pager('/api/libraries/', {active: 'true'}),
+            inactive_list: pager('/api/libraries/', {active: 'false'}),
             update: $resource('/api/libraries/edit\\/', {}, {
                 put: {
                     method: 'PUT'
@@ -126,14 +210,10 @@ projectApp.factory('auth', function($resource) {
             })
         };
     }).
-    factory('project', function($resource) {
+    factory('project', function($resource, pager) {
         return {
-            list: $resource('/api/projects\\/', {}, {
-                get: {
-                    method: 'GET',
-                    isArray: true
-                }
-            }),
+            // the libraries come from the precomputed project summaries (see api/summaries.py)
+            list: pager('/api/projects/', {view: 'summary'}),
             update: $resource('/api/projects\\/', {}, {
                 put: {
                     method: 'PUT'
@@ -205,9 +285,11 @@ angular.module('project.controller', []).
         $scope.library_master = {};
 
         $scope.list = function() {
-            library.list.get(function(data) {
-                $scope.libraries = data;
-                library.inactive_list.get(function(data) {
+            $scope.libraries = [];
+            library.list.get(function(page) {
+                Array.prototype.push.apply($scope.libraries, page);
+            }, function() {
+                library.inactive_list.get_all(function(data) {
                     $scope.inactive_libraries = data;
                     angular.forEach($scope.libraries, function(data, key) {
                         var found = false;
@@ -332,7 +414,9 @@ angular.module('project.controller', []).
             });
         };
     }).
-    controller('projectListController', function($scope, $http, $filter, $route, $rootScope, $compile, $window, alertService, library, project, flagState, focus) {
+    controller('projectListController', function($scope, $http, $filter, $route, $rootScope, $compile, $window, alertService, library, project, sync, events, flagState, focus) {
+        var sync_token, libraries_by_id = {}, changes_pending = false;
+
         $scope.flagState = flagState;
         $scope.project_edit_mode = false;
         $scope.project_master = {};
@@ -340,41 +424,94 @@ angular.module('project.controller', []).
         $scope.new_no_added_libraries = true;
 
         $scope.library_list = function() {
-            library.active_list.get(function(data) {
+            library.active_list.get_all(function(data) {
                 $scope.libraries = data;
+                libraries_by_id = {};
+                angular.forEach(data, function (lib) {
+                    libraries_by_id[lib.id] = lib;
+                });
             });
         };
 
+        // the client side state of a listed project: its library entries start out unchanged
+        function prepare_project(item) {
+            item['no_added_libraries'] = item.libraries.length === 0;
+            angular.forEach(item.libraries, function (lib_project_item) {
+                lib_project_item['remove'] = false;
+                lib_project_item['updated'] = false;
+                lib_project_item['new'] = false;
+            });
+            return item;
+        }
+
         $scope.project_list = function() {
-            var all_libraries;
+            $scope.projects = [];
+            // the sync token is taken first, so changes made while the lists load are not missed
+            sync.start(function (token) {
+                var stop_listening;
+
+                sync_token = token;
+                load_projects();
+                if (token === null) {
+                    // no live updates without a token to sync from
+                    return;
+                }
+                // changes by other users are applied as they happen, except to a project that is being edited
+                stop_listening = events.listen(function (models) {
+                    if (models.library) {
+                        $scope.library_list();
+                    }
+                    if (flagState.project_edit_mode) {
+                        changes_pending = true;
+                    } else {
+                        $scope.refresh_projects();
+                    }
+                });
+                $scope.$on('$destroy', stop_listening);
+            });
+        };
 
-            project.list.get(function (data) {
-                $scope.projects = data;
-                library.list.get(function (all_data) {
-                    all_libraries = all_data;
-                    angular.forEach($scope.projects, function (item, key) {
-                        var selected, found_subkey, found = false;
+        // applies the changes since the last sync to the project list in place, instead of loading it again; without
+        // a token to sync from, the list is loaded again, taking a token for the next refreshes
+        $scope.refresh_projects = function() {
+            changes_pending = false;
+            if (sync_token === null) {
+                $scope.project_list();
+                return;
+            }
+            sync.changes(sync_token, function (changes) {
+                var positions = {}, deleted = {};
 
-                        $scope.projects[key]['no_added_libraries'] = item.libraries.length === 0;
-                        angular.forEach(item.libraries, function (lib_project_item, lib_project_item_key) {
-                            angular.forEach(all_libraries, function (lib_item, lib_item_key) {
-                                if (lib_project_item.id === lib_item.id) {
-                                    found = true;
-                                    selected = lib_item;
-                                    found_subkey = lib_project_item_key;
-                                }
-                            });
-                            if (found) {
-                                $scope.projects[key].libraries[found_subkey]['remove'] = false;
-                                $scope.projects[key].libraries[found_subkey]['updated'] = false;
-                                $scope.projects[key].libraries[found_subkey]['new'] = false;
-                            }
-                        });
-                    });
+                sync_token = changes.token;
+                angular.forEach(changes.deleted.projects, function (project_id) {
+                    deleted[project_id] = true;
                 });
+                $scope.projects = $scope.projects.filter(function (item) {
+                    return !deleted[item.id];
+                });
+                angular.forEach($scope.projects, function (item, key) {
+                    positions[item.id] = key;
+                });
+                angular.forEach(changes.projects, function (item) {
+                    prepare_project(item);
+                    if (positions.hasOwnProperty(item.id)) {
+                        $scope.projects[positions[item.id]] = item;
+                    } else {
+                        positions[item.id] = $scope.projects.push(item) - 1;
+                    }
+                });
+            }, function () {
+                $route.reload();
             });
         };
 
+        function load_projects() {
+            // every page is prepared as it arrives, in one pass over its projects and their library entries
+            project.list.get(function (page) {
+                Array.prototype.push.apply($scope.projects, page.map(prepare_project));
+            });
+        }
+
         $scope.today = new Date();
 
         $scope.open_link = function(url) {
@@ -462,11 +599,9 @@ angular.module('project.controller', []).
                 form.library_version.$render();
             }
 
-            angular.forEach($scope.libraries, function(lib, key) {
-                if (lib.id === dropdown_value) {
-                    library_description = lib.description;
-                }
-            });
+            if (libraries_by_id.hasOwnProperty(dropdown_value)) {
+                library_description = libraries_by_id[dropdown_value].description;
+            }
 
             var data = {
                 id: dropdown_value,
@@ -540,7 +675,7 @@ angular.module('project.controller', []).
                     flagState.project_edit_mode = false;
                     flagState.library_add_mode = false;
                     alertService.add_clear('warning', "You have deleted a Project record.", 0);
-                    $route.reload();
+                    $scope.refresh_projects();
                 }, function(data, status, headers, config) {
                     $rootScope.message_title = "Save Project Error";
                     $rootScope.message_body = "Error: unable to delete record.";
@@ -592,6 +727,9 @@ angular.module('project.controller', []).
             flagState.library_add_mode = false;
             alertService.clear_alerts();
             //alertService.add_clear('warning', "Changes to the Project record were cancelled.", 0);
+            if (changes_pending) {
+                $scope.refresh_projects();
+            }
         };
 
         $scope.append_done = function(form, libraries) {
@@ -653,7 +791,7 @@ angular.module('project.controller', []).
                 flagState.project_edit_mode = false;
                 flagState.library_add_mode = false;
                 alertService.add_clear('success', "Changes to the Project record were saved.", 0);
-                $route.reload();
+                $scope.refresh_projects();
             }, function(data, status, headers, config) {
                 $rootScope.message_title = "Save Project Error";
                 $rootScope.message_body = "Error: unable to save information.";
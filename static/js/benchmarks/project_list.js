@@ -0,0 +1,158 @@
+/*** Authored by Peter Garas for Ocom Software ***/
+
+// Benchmark of the project page's list preparation (projectListController.project_list in app.js), run with node:
+//
+//     node static/js/benchmarks/project_list.js [--projects 5000] [--libraries 500] [--entries 8] [--app <app.js>]
+//
+// app.js is loaded with a minimal stand-in for angular.module() that records the controllers, and the controller is
+// run against a generated fixture of projects (each using --entries of the --libraries libraries) served by fake
+// services, page by page like the API. --app times another version of app.js, e.g. an older one from git.
+
+var fs = require('fs');
+var path = require('path');
+var vm = require('vm');
+
+function get_options() {
+    var options = {projects: 5000, libraries: 500, entries: 8, app: path.join(__dirname, '..', 'app.js')};
+    var args = process.argv.slice(2);
+
+    for (var i = 0; i < args.length; i += 2) {
+        var name = args[i].replace(/^--/, '');
+
+        if (!options.hasOwnProperty(name)) {
+            throw new Error('Unknown option: ' + args[i]);
+        }
+        options[name] = name === 'app' ? args[i + 1] : parseInt(args[i + 1], 10);
+    }
+    return options;
+}
+
+function make_fixture(options) {
+    var libraries = [], projects = [], entry_id = 0;
+
+    for (var i = 1; i <= options.libraries; i++) {
+        libraries.push({id: i, description: 'Library ' + i, active_start_date: '2017-01-01', active_end_date: null});
+    }
+    for (var j = 1; j <= options.projects; j++) {
+        var entries = [];
+
+        for (var k = 0; k < options.entries; k++) {
+            var library = libraries[(j * 7 + k * 13) % libraries.length];
+
+            entry_id += 1;
+            entries.push({id: entry_id, library_id: library.id, description: library.description, version: '1.' + k});
+        }
+        projects.push({id: j, name: 'Project ' + j, active_start_date: '2017-01-01', active_end_date: null,
+                       description: '', client_name: 'Client', git_url: 'https://example.com/' + j + '.git',
+                       testing_url: '', production_url: '', library_count: entries.length, libraries: entries});
+    }
+    return {libraries: libraries, projects: projects};
+}
+
+// angular.forEach, for arrays and plain objects
+function for_each(collection, iterator) {
+    if (Array.isArray(collection)) {
+        for (var i = 0; i < collection.length; i++) {
+            iterator(collection[i], i);
+        }
+    } else if (collection) {
+        Object.keys(collection).forEach(function (key) {
+            iterator(collection[key], key);
+        });
+    }
+}
+
+function load_controllers(app_path) {
+    var controllers = {};
+    var module = {};
+
+    ['config', 'service', 'factory', 'directive', 'run', 'filter', 'value', 'constant'].forEach(function (name) {
+        module[name] = function () {
+            return module;
+        };
+    });
+    module.controller = function (name, constructor) {
+        controllers[name] = constructor;
+        return module;
+    };
+    vm.runInNewContext(fs.readFileSync(app_path, 'utf8'), {
+        angular: {module: function () { return module; }, forEach: for_each, noop: function () {},
+                  fromJson: JSON.parse},
+        $: function () { return {}; },
+        console: console
+    }, {filename: app_path});
+    return controllers;
+}
+
+// the services of projectListController, serving the fixture synchronously; the copies the controller gets are made
+// up front, as the API responses would already be parsed
+function make_services(fixture, scope) {
+    var pages = function (items) {
+        var copies = [];
+
+        for (var i = 0; i < items.length; i += 100) {
+            copies.push(JSON.parse(JSON.stringify(items.slice(i, i + 100))));
+        }
+        return {
+            get: function (on_page, on_done) {
+                copies.forEach(function (page) {
+                    on_page(page);
+                });
+                if (on_done) {
+                    on_done();
+                }
+            },
+            get_all: function (callback) {
+                callback([].concat.apply([], copies));
+            }
+        };
+    };
+
+    return {
+        $scope: scope,
+        library: {list: pages(fixture.libraries), active_list: pages(fixture.libraries)},
+        project: {list: pages(fixture.projects)},
+        sync: {start: function (callback) { callback('token'); }, changes: function () {}},
+        events: {listen: function () { return function () {}; }},
+        flagState: {}
+    };
+}
+
+function get_parameters(constructor) {
+    var source = constructor.toString();
+
+    return source.slice(source.indexOf('(') + 1, source.indexOf(')')).split(',').map(function (name) {
+        return name.trim();
+    }).filter(Boolean);
+}
+
+function main() {
+    var options = get_options();
+    var fixture = make_fixture(options);
+    var constructor = load_controllers(options.app).projectListController;
+    var scope = {$on: function () {}};
+    var services = make_services(fixture, scope);
+    var start, elapsed, prepared = 0;
+
+    constructor.apply(null, get_parameters(constructor).map(function (name) {
+        return services.hasOwnProperty(name) ? services[name] : {};
+    }));
+
+    start = process.hrtime();
+    scope.project_list();
+    elapsed = process.hrtime(start);
+
+    scope.projects.forEach(function (item) {
+        item.libraries.forEach(function (entry) {
+            if (entry.remove === false && entry.updated === false && entry['new'] === false) {
+                prepared += 1;
+            }
+        });
+    });
+    console.log(options.projects + ' projects, ' + options.libraries + ' libraries, ' + options.entries +
+                ' entries per project (' + path.relative(process.cwd(), options.app) + ')');
+    console.log('project_list: ' + (elapsed[0] * 1000 + elapsed[1] / 1e6).toFixed(1) + ' ms, ' +
+                scope.projects.length + ' projects loaded, ' + prepared + ' library entries prepared');
+}
+
+main();